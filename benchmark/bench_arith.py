@@ -0,0 +1,54 @@
+"""
+time the interpreter handler of every arithmetic opcode for each pair of operand types
+
+    python -m benchmark.bench_arith [-n NUMBER]
+"""
+import argparse
+import timeit
+
+from lapi import LuaState
+from lop import OPCODE, dispatch, genericOps
+
+OPERANDS = [('int/int', 7, 3), ('float/float', 7.5, 2.0), ('int/float', 7, 2.0), ('string/int', '7', 3)]
+BITWISE_OPERANDS = [('int/int', 7, 3), ('float/float', 7.0, 3.0), ('int/float', 7, 3.0), ('string/int', '7', 3)]
+UNARY_OPERANDS = [('int', 7), ('float', 7.5), ('string', '7')]
+BITWISE_UNARY_OPERANDS = [('int', 7), ('float', 7.0), ('string', '7')]
+
+
+def frame():
+    ls = LuaState()
+    ls.stack.consts = []
+    ls.SetTop(3)
+    return ls
+
+
+def time(ls: LuaState, inst, number: int) -> float:
+    """
+    :return: nanoseconds per run of the handler
+    """
+    handler = dispatch[genericOps.get(inst[0], inst[0])]
+    best = min(timeit.repeat(lambda: handler(ls, inst, 1), number=number, repeat=5))
+    return best / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--number', type=int, default=100000)
+    args = parser.parse_args()
+    ls = frame()
+    slots = ls.stack.slots
+    for op in range(OPCODE.OP_ADD.value, OPCODE.OP_BNOT.value + 1):
+        name = OPCODE(op).name
+        if op >= OPCODE.OP_UNM.value:
+            for operands, x in UNARY_OPERANDS if op == OPCODE.OP_UNM.value else BITWISE_UNARY_OPERANDS:
+                slots[1] = x
+                print('{:<8} {:<12} {:8.1f} ns'.format(name, operands, time(ls, (op, 0, 1, 0), args.number)))
+            continue
+        pairs = OPERANDS if op < OPCODE.OP_BAND.value else BITWISE_OPERANDS
+        for operands, x, y in pairs:
+            slots[1], slots[2] = x, y
+            print('{:<8} {:<12} {:8.1f} ns'.format(name, operands, time(ls, (op, 0, 1, 2), args.number)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+time loading luac files without running them: reading, decoding and fusing every proto
+
+    python -m benchmark.bench_load [-n NUMBER] [file.out ...]
+
+a file is loaded both as an open file, which the loader maps with mmap, and as bytes
+"""
+import argparse
+import os
+import timeit
+
+from benchmark.bench_vm import DEFAULT_FILES, LUA_DIR
+from lapi import LuaState
+
+
+def load(ls: LuaState, chunk):
+    ls.Load(chunk, 'bench', 'b')
+    ls.Pop(1)
+
+
+def loadFile(ls: LuaState, path: str):
+    with open(path, 'rb') as f:
+        load(ls, f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--number', type=int, default=20)
+    parser.add_argument('files', nargs='*', default=DEFAULT_FILES)
+    args = parser.parse_args()
+    ls = LuaState()
+    for name in args.files:
+        path = name if os.path.exists(name) else os.path.join(LUA_DIR, name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        for how, run in (('file', lambda: loadFile(ls, path)), ('bytes', lambda: load(ls, data))):
+            best = min(timeit.repeat(run, number=args.number, repeat=5)) / args.number
+            print('{:<18} {:<6} {:10.1f} us/load {:8.1f} MB/s'.format(os.path.basename(name), how, best * 1e6,
+                                                                       len(data) / best / 1e6))
+
+
+if __name__ == '__main__':
+    main()
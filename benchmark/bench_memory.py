@@ -0,0 +1,107 @@
+"""
+memory held by lua values: bytes and allocations per value, measured with tracemalloc
+
+    python -m benchmark.bench_memory [-n COUNT]
+
+each kind of value is built three ways: a fresh LuaValue box per value (how
+every result was stored before values were unboxed), the LuaNil / LuaBoolean /
+LuaNumber constructors with their shared singletons and small integer boxes,
+and the unboxed python object the VM keeps in registers and tables now;
+numeric array parts are compared with a list holding the same values
+"""
+import argparse
+import tracemalloc
+
+from lvalue import LUATYPE, LuaBoolean, LuaClosure, LuaNil, LuaNumber, LuaString, LuaValue, Proto
+from ltable import LuaTable
+
+KINDS = [
+    ('nil', LUATYPE.LUA_TNIL.value, lambda i: None, lambda i: LuaNil()),
+    ('boolean', LUATYPE.LUA_TBOOLEAN.value, lambda i: i % 2 == 0, lambda i: LuaBoolean(i % 2 == 0)),
+    ('small int', LUATYPE.LUA_TNUMBER.value, lambda i: i % 1000, lambda i: LuaNumber(i % 1000)),
+    ('float', LUATYPE.LUA_TNUMBER.value, lambda i: i + 0.5, lambda i: LuaNumber(i + 0.5)),
+    ('string', LUATYPE.LUA_TSTRING.value, lambda i: 'k{}'.format(i % 100), lambda i: LuaString('k{}'.format(i % 100))),
+]
+
+
+def measure(make, count: int) -> (float, float):
+    """
+    :param make: builds the i-th value
+    :param count:
+    :return: bytes per value, allocations per value
+    """
+    values = [None] * count
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(count):
+        values[i] = make(i)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    allocations = sum(stat.count_diff for stat in stats)
+    return size / count, allocations / count
+
+
+def record(i: int) -> LuaTable:
+    """
+    {x = i, y = i, name = 'p'}
+    """
+    t = LuaTable(0, 3)
+    t.put('x', i)
+    t.put('y', i)
+    t.put('name', 'p')
+    return t
+
+
+def measureArray(make, count: int) -> float:
+    """
+    :param make: builds the i-th element, called while the array is filled
+    :param count:
+    :return: bytes per element of a table array part, of a list holding the same values
+    """
+    def table(n):
+        t = LuaTable(0, 0)
+        for i in range(1, n + 1):
+            t.put(i, make(i))
+        return t
+
+    def plain(n):
+        return [make(i) for i in range(1, n + 1)]
+
+    sizes = []
+    for build in (table, plain):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        kept = build(count)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        sizes.append(sum(stat.size_diff for stat in after.compare_to(before, 'filename')) / count)
+        del kept
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--count', type=int, default=100000)
+    args = parser.parse_args()
+    print('{:<10} {:>22} {:>22} {:>22}'.format('value', 'fresh box', 'shared box', 'unboxed'))
+    for name, luaType, raw, boxed in KINDS:
+        fresh = measure(lambda i: LuaValue(luaType, raw(i)), args.count)
+        shared = measure(boxed, args.count)
+        unboxed = measure(raw, args.count)
+        columns = ''.join(' {:>8.1f} B {:>6.2f} allocs'.format(*m) for m in (fresh, shared, unboxed))
+        print('{:<10}'.format(name) + columns)
+    proto = Proto('', 0, 0, 0, False, 2, [], [], [[1, 0]], [], [], [], ['_ENV'])
+    objects = (('table', lambda i: LuaTable(0, 0)), ('record', record), ('closure', lambda i: LuaClosure(proto)))
+    for name, make in objects:
+        print('{:<10} {:>8.1f} B {:>6.2f} allocs'.format(name, *measure(make, args.count)))
+    print('{:<12} {:>14} {:>14}'.format('array part', 'table', 'list'))
+    arrays = (('int', lambda i: i * 1000), ('float', lambda i: i * 0.5),
+              ('mixed', lambda i: i * 0.5 if i % 2 else i))
+    for name, make in arrays:
+        print('{:<12} {:>12.1f} B {:>12.1f} B'.format(name, *measureArray(make, args.count)))
+
+
+if __name__ == '__main__':
+    main()
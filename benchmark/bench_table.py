@@ -0,0 +1,119 @@
+"""
+time LuaTable stores and loads for array, hash and mixed workloads
+
+    python -m benchmark.bench_table [-n COUNT]
+"""
+import argparse
+import timeit
+
+from ltable import LuaTable
+
+
+def arrayFill(count: int, keys: list):
+    t = LuaTable(0, 0)
+    for i in range(1, count + 1):
+        t.put(i, i)
+    return t
+
+
+def presizedArrayFill(count: int, keys: list):
+    t = LuaTable(count, 0)
+    for i in range(1, count + 1):
+        t.put(i, i)
+    return t
+
+
+def reverseArrayFill(count: int, keys: list):
+    t = LuaTable(0, 0)
+    for i in range(count, 0, -1):
+        t.put(i, i)
+    return t
+
+
+def appendFill(count: int, keys: list):
+    # t[#t + 1] = v
+    t = LuaTable(0, 0)
+    for i in range(count):
+        t.put(t.len() + 1, i)
+    return t
+
+
+def stackChurn(count: int, keys: list):
+    # t[#t + 1] = v; t[#t] = nil on a table that keeps about 1000 items
+    t = LuaTable(0, 0)
+    for i in range(1, 1001):
+        t.put(i, i)
+    for i in range(count // 2):
+        t.put(t.len() + 1, i)
+        t.put(t.len(), None)
+    return t
+
+
+def queueChurn(count: int, keys: list):
+    # push at t[#t + 1], pop at t[first]
+    t = LuaTable(0, 0)
+    first = 1
+    for i in range(count // 2):
+        t.put(t.len() + 1, i)
+        t.put(t.len() + 1, i)
+        t.put(first, None)
+        first += 1
+    return t
+
+
+def hashFill(count: int, keys: list):
+    t = LuaTable(0, 0)
+    for key in keys:
+        t.put(key, 1)
+    return t
+
+
+def mixedFill(count: int, keys: list):
+    t = LuaTable(0, 0)
+    for i, key in enumerate(keys, 1):
+        t.put(i, key)
+        t.put(key, i)
+        t.put(i + 0.5, i)
+    return t
+
+
+def arrayRead(count: int, keys: list, t=None):
+    get = t.get
+    for i in range(1, count + 1):
+        get(i)
+
+
+def hashRead(count: int, keys: list, t=None):
+    get = t.get
+    for key in keys:
+        get(key)
+
+
+WORKLOADS = [('array fill', arrayFill), ('presized fill', presizedArrayFill), ('reverse fill', reverseArrayFill),
+             ('append #t+1', appendFill), ('stack churn', stackChurn), ('queue churn', queueChurn),
+             ('hash fill', hashFill), ('mixed fill', mixedFill)]
+READS = [('array read', arrayRead, arrayFill), ('hash read', hashRead, hashFill)]
+
+
+def bench(run, count: int) -> float:
+    """
+    :return: nanoseconds per element
+    """
+    return min(timeit.repeat(run, number=1, repeat=5)) / count * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--count', type=int, default=100000)
+    args = parser.parse_args()
+    count = args.count
+    keys = ['k{}'.format(i) for i in range(count)]
+    for name, fill in WORKLOADS:
+        print('{:<14} {:8.1f} ns/key'.format(name, bench(lambda: fill(count, keys), count)))
+    for name, read, fill in READS:
+        t = fill(count, keys)
+        print('{:<14} {:8.1f} ns/key'.format(name, bench(lambda: read(count, keys, t), count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+time whole-chunk execution of the sample luac files in lua/
+
+    python -m benchmark.bench_vm [-n NUMBER] [--no-fuse] [--jit] [file.out ...]
+"""
+import argparse
+import io
+import os
+import timeit
+
+from lapi import LuaState
+from lvalue import LuaString
+
+LUA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lua')
+DEFAULT_FILES = ['loop.out', 'closure.out', 'bench_loop.out', 'bench_fib.out', 'bench_concat.out',
+                 'bench_iter.out', 'bench_record.out', 'bench_setlist.out', 'bench_meta.out']
+
+
+def runChunk(data: bytes, **options):
+    ls = LuaState(**options)
+    ls.Register(LuaString('print'), lambda vm: 0)
+    ls.Load(io.BytesIO(data), 'bench', 'b')
+    ls.Call(0, 0)
+
+
+def bench(name: str, number: int, repeat: int = 5, **options) -> float:
+    with open(os.path.join(LUA_DIR, name), 'rb') as f:
+        data = f.read()
+    best = min(timeit.repeat(lambda: runChunk(data, **options), number=number, repeat=repeat))
+    return best / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--number', type=int, default=200)
+    parser.add_argument('--no-fuse', dest='fuse', action='store_false')
+    parser.add_argument('--jit', action='store_true')
+    parser.add_argument('files', nargs='*', default=DEFAULT_FILES)
+    args = parser.parse_args()
+    for name in args.files:
+        print('{:<16} {:10.1f} us/run'.format(name, bench(name, args.number, fuse=args.fuse, jit=args.jit) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
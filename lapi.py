@@ -1,59 +1,49 @@
-from math import pow
-from typing import List
-
-from lmath import ShiftLeft, ShiftRight
-from lop import Instruction, OPCODE, COMOPENUM, ARIOPENUM
-from ltable import LuaArray, LuaTable
-from lvalue import LuaNil, LuaValue, LuaString, LuaNumber, LUATYPE, LuaClosure
+from lbaselib import openBase
+from ljit import compileProto
+from lop import dispatch, fuseProto, comparators, COMOPENUM, ARIOPENUM
+from ltable import LuaArray, LuaTable, TM_ADD, TM_CALL, TM_CONCAT, TM_EQ, TM_INDEX, TM_LE, TM_LEN, TM_LT, \
+    TM_NEWINDEX, metamethod
+from lvalue import LUATYPE, LuaClosure, LuaRope, LuaString, LuaValue, arithMatrices, convertToFloat, convertToInteger, \
+    numberToString, toBoolean, typeOf, unbox
 from lvm import LuaVM
 
-iadd = fadd = lambda a, b: a + b
-isub = fsub = lambda a, b: a - b
-imul = fmul = lambda a, b: a * b
-imod = fmod = lambda a, b: a % b
-lpow = pow
-div = lambda a, b: a / b
-iidiv = fidiv = lambda a, b: a // b
-band = lambda a, b: a & b
-bor = lambda a, b: a | b
-bxor = lambda a, b: a ^ b
-shl = ShiftLeft
-shr = ShiftRight
-iunm = funm = lambda a: -a
-bnot = lambda a: ~a
-
-arithOperators = [(iadd, fadd), (isub, fsub), (imul, fmul), (imod, fmod), (None, lpow), (None, div), (iidiv, fidiv),
-                  (band, None), (bor, None), (bxor, None), (shl, None), (shr, None), (iunm, funm), (bnot, None)]
-
 
 class LuaStack:
-    def __init__(self, size: int, ls):
-        self.slots = LuaArray()
-        self.size = size
+    __slots__ = ('slots', 'base', 'top', 'prev', 'closure', 'consts', 'varargs', 'retBase', 'ls', 'openuvs', 'cursors')
+
+    def __init__(self, slots: list, base: int, ls):
+        # one frame of the state: slots is the register file shared by every frame
+        # of the state, the frame's index 1 / register 0 lives at slots[base]
+        self.slots = slots
+        self.base = base
         self.top = 0
-        for i in range(size):
-            self.slots.append(LuaNil())
         self.prev = None
         self.closure = None
+        self.consts = None
         self.varargs = None
-        self.pc = 0
+        # register of the first value handed back by RETURN, results run up to top
+        self.retBase = 0
         self.ls = ls
         self.openuvs = {}
+        # register A of a TFORCALL -> cursor of the native next running that loop
+        self.cursors = None
 
     def check(self, n):
-        free = len(self.slots) - self.top
-        # if free < n:
-        for i in range(free, n):
-            self.slots.append(LuaNil())
+        size = self.base + self.top + n
+        if size > LuaState.LUA_MAXSTACK:
+            raise RuntimeError('stack overflow')
+        free = size - len(self.slots)
+        if free > 0:
+            self.slots.extend([None] * free)
 
     def push(self, luaValue):
-        if self.top == len(self.slots):
-            # self.check(n)
-            raise RuntimeError('stack overflow')
-        self.slots[self.top] = luaValue
+        index = self.base + self.top
+        if index == len(self.slots):
+            self.check(1)
+        self.slots[index] = luaValue
         self.top += 1
 
-    def pushN(self, values: List[LuaValue], n: int):
+    def pushN(self, values: list, n: int):
         # if values is  None:
         #     return
         valuesNum = len(values)
@@ -63,19 +53,20 @@ class LuaStack:
             if i < valuesNum:
                 self.push(values[i])
             else:
-                self.push(LuaNil())
+                self.push(None)
 
-    def pop(self) -> LuaValue:
+    def pop(self):
         if self.top < 1:
             raise RuntimeError('stack underflow')
         self.top -= 1
-        # replace pop slots with set the slot to lua nil
-        item = self.slots[self.top]
-        self.slots[self.top] = LuaNil()
+        # clear the popped slot to nil
+        index = self.base + self.top
+        item = self.slots[index]
+        self.slots[index] = None
         return item
 
-    def popN(self, n: int) -> List[LuaValue]:
-        tmplist = [LuaNil()] * n
+    def popN(self, n: int) -> list:
+        tmplist = [None] * n
         for i in range(n - 1, -1, -1):
             tmplist[i] = self.pop()
         return tmplist
@@ -100,13 +91,13 @@ class LuaStack:
             uvindex = LuaState.LUA_REGISTRYINDEX - index - 1
             c = self.closure
             if (c is None) or (uvindex >= len(c.upvalues)):
-                return LuaNil()
+                return None
             return c.upvalues[uvindex]
         if index is LuaState.LUA_REGISTRYINDEX:
             return self.ls.registry
         absIndex = self.absIndex(index)
         if 0 < absIndex <= self.top:
-            item = self.slots[absIndex - 1]
+            item = self.slots[self.base + absIndex - 1]
             return item
         return None
 
@@ -122,20 +113,22 @@ class LuaStack:
             return
         absIndex = self.absIndex(index)
         if 0 < absIndex <= self.top:
-            self.slots[absIndex - 1] = luavalue
+            self.slots[self.base + absIndex - 1] = luavalue
             return
         raise IndexError('invalid index')
 
     def reverse(self, fromindex, toindex):
-        # slots = self.slots
+        slots = self.slots
+        fromindex += self.base
+        toindex += self.base
         while fromindex < toindex:
-            self.slots[fromindex], self.slots[toindex] = self.slots[toindex], self.slots[fromindex]
+            slots[fromindex], slots[toindex] = slots[toindex], slots[fromindex]
             fromindex += 1
             toindex -= 1
 
 
-def newLuaStack(size, ls):
-    return LuaStack(size, ls)
+def newLuaStack(slots, base, ls):
+    return LuaStack(slots, base, ls)
 
 
 class LuaState(LuaVM):
@@ -143,13 +136,29 @@ class LuaState(LuaVM):
     LUA_MAXSTACK = 1000000
     LUA_REGISTRYINDEX = -LUA_MAXSTACK - 1000
     LUA_RIDX_GLOBALS = 2
-    T_LUA_RIDX_GLOBALS = LuaNumber(LUA_RIDX_GLOBALS)
-
-    def __init__(self):
-        self.stack = newLuaStack(self.LUA_MINSTACK, self)
+    T_LUA_RIDX_GLOBALS = LUA_RIDX_GLOBALS
+    # strings up to this length are interned
+    LUAI_MAXSHORTLEN = 40
+    # __index / __newindex handlers followed before a chain is taken for a loop
+    MAXTAGLOOP = 2000
+
+    def __init__(self, fuse: bool = True, jit: bool = False):
+        """
+        :param fuse: fuse common instruction pairs of loaded chunks into superinstructions
+        :param jit: translate loaded chunks to python functions, see ljit
+        """
+        self.fuse = fuse
+        self.jit = jit
+        # intern table of short strings: chunk constants and strings handed in through the api, runtime
+        # results only reuse its entries so a loop building strings does not keep them alive, see lookupString
+        self.strt = {}
+        # register file of every frame, a frame is a base offset into it
+        self.slots = [None] * self.LUA_MINSTACK
+        self.stack = newLuaStack(self.slots, 0, self)
         self.registry = LuaTable(0, 0)
         self.registry.put(self.T_LUA_RIDX_GLOBALS, LuaTable(0, 0))
-        self.pushLuaStack(newLuaStack(self.LUA_MINSTACK, self))
+        self.pushLuaStack(newLuaStack(self.slots, 0, self))
+        openBase(self)
 
     def GetTop(self):
         return self.stack.top
@@ -201,22 +210,42 @@ class LuaState(LuaVM):
                 self.stack.pop()
         elif n < 0:
             for i in range(abs(n)):
-                self.stack.push(LuaNil())
+                self.stack.push(None)
 
     def PushNil(self):
-        self.stack.push(LuaNil())
+        self.stack.push(None)
 
     def PushBoolean(self, bool):
-        self.stack.push(LuaValue(LUATYPE.LUA_TBOOLEAN.value, bool))
+        self.stack.push(True if bool else False)
 
     def PushInteger(self, number):
-        self.stack.push(LuaNumber(number))
+        self.stack.push(number)
 
     def PushNumber(self, number):
-        self.stack.push(LuaNumber(number))
+        self.stack.push(number)
 
     def PushString(self, str):
-        self.stack.push(LuaString(str))
+        self.stack.push(self.internString(unbox(str)))
+
+    def internString(self, value: str) -> str:
+        """
+        equal short strings share one object per state, like lua's strt, so
+        comparing them and hashing them as table keys starts with an identity hit
+        :param value: python str
+        :return: the state's copy of value
+        """
+        if len(value) > self.LUAI_MAXSHORTLEN:
+            return value
+        return self.strt.setdefault(value, value)
+
+    def lookupString(self, value: str) -> str:
+        """
+        the interned copy of a string built at run time when there is one, value itself
+        otherwise; strt is a plain dict, adding every concat result to it would keep them all
+        :param value: python str
+        :return: value or its equal from strt
+        """
+        return self.strt.get(value, value)
 
     def TypeName(self, tp):
         if tp is LUATYPE.LUA_TNONE.value:
@@ -240,7 +269,7 @@ class LuaState(LuaVM):
 
     def Type(self, index):
         if self.stack.isValid(index):
-            return self.stack.get(index).typeOf()
+            return typeOf(self.stack.get(index))
         return LUATYPE.LUA_TNONE.value
 
     def IsNone(self, index):
@@ -263,33 +292,36 @@ class LuaState(LuaVM):
         return self.ToNumberX(index)[1]
 
     def IsInteger(self, index):
-        return type(self.stack.get(index).value) is int
+        return type(self.stack.get(index)) is int
 
     def ToBoolean(self, index):
-        return bool(self.stack.get(index).value)
+        return toBoolean(self.stack.get(index))
 
     def ToNumber(self, index):
         return self.ToNumberX(index)[0]
 
     def ToNumberX(self, index):
-        luavalue = self.stack.get(index)
-        return luavalue.convertToFloat()
+        return convertToFloat(self.stack.get(index))
 
     def ToInteger(self, index):
         return self.ToIntegerX(index)[0]
 
     def ToIntegerX(self, index):
-        return self.stack.get(index).convertToInteger()
+        return convertToInteger(self.stack.get(index))
 
     def ToStringX(self, index):
-        value = self.stack.get(index).value
+        value = self.stack.get(index)
         valueType = type(value)
         if valueType is str:
             return LuaString(value), True
+        elif valueType is LuaRope:
+            value = value.flatten()
+            self.stack.set(index, value)
+            return LuaString(value), True
         elif valueType is int or valueType is float:
-            toStrValue = LuaString(str(value))
+            toStrValue = self.lookupString(numberToString(value))
             self.stack.set(index, toStrValue)
-            return toStrValue, True
+            return LuaString(toStrValue), True
         else:
             return "", False
 
@@ -300,35 +332,100 @@ class LuaState(LuaVM):
         return self.ToStringX(index)[0].value if self.ToStringX(index)[1] else ''
 
     def Arith(self, op):
-        a = None
         b = self.stack.pop()
         if op != ARIOPENUM.LUA_OPUNM.value and op != ARIOPENUM.LUA_OPBNOT.value:
-            a = self.stack.pop()
-        operator = arithOperators[op]
-        result = LuaValue.arith(a, b, operator)
-        if result is not None:
-            self.stack.push(result)
+            result = self.arith(self.stack.pop(), b, op)
         else:
-            raise ArithmeticError('arithmetic error')
+            result = self.unaryArith(b, op)
+        self.stack.push(result)
+
+    def arith(self, a, b, op: int):
+        """
+        a op b for operands off the type pair fast path of arithMatrices: a table
+        with a handler for op goes through it, anything else to LuaValue.arith
+        :param op: ArithOp
+        """
+        if type(a) is LuaTable or type(b) is LuaTable:
+            handler = self.binaryMetamethod(a, b, TM_ADD + op)
+            if handler is not None:
+                return self.callMetamethod(handler, a, b)
+        return LuaValue.arith(a, b, arithMatrices[op])
+
+    def unaryArith(self, b, op: int):
+        """
+        op b off the fast path, lua hands a unary handler its operand twice
+        :param op: ArithOp
+        """
+        if type(b) is LuaTable:
+            handler = metamethod(b.metatable, TM_ADD + op)
+            if handler is not None:
+                return self.callMetamethod(handler, b, b)
+        return LuaValue.unaryArith(b, arithMatrices[op])
 
     def Compare(self, idx1, idx2, compareOp):
-        a = self.stack.get(idx1)
-        b = self.stack.get(idx2)
-        if compareOp == COMOPENUM.LUA_OPEQ.value:
-            return LuaValue.eq(a, b)
-        elif compareOp == COMOPENUM.LUA_OPLT.value:
-            return LuaValue.lt(a, b)
-        elif compareOp == COMOPENUM.LUA_OPLE.value:
-            return LuaValue.le(a, b)
-        else:
+        if not 0 <= compareOp < len(comparators):
             raise RuntimeError('invalid compare operation')
+        return self.compare(self.stack.get(idx1), self.stack.get(idx2), compareOp)
+
+    def compare(self, a, b, op: int) -> bool:
+        """
+        a op b, tables through their __eq / __lt / __le handlers: __eq only between two
+        different tables, a missing __le falls back to not (b < a) like lua 5.3
+        :param op: CompareOp
+        """
+        if op == COMOPENUM.LUA_OPEQ.value:
+            if a is b or type(a) is not LuaTable or type(b) is not LuaTable:
+                return LuaValue.eq(a, b)
+            handler = self.binaryMetamethod(a, b, TM_EQ)
+            return handler is not None and toBoolean(self.callMetamethod(handler, a, b))
+        if type(a) is LuaTable or type(b) is LuaTable:
+            handler = self.binaryMetamethod(a, b, TM_LT if op == COMOPENUM.LUA_OPLT.value else TM_LE)
+            if handler is not None:
+                return toBoolean(self.callMetamethod(handler, a, b))
+            if op == COMOPENUM.LUA_OPLE.value:
+                handler = self.binaryMetamethod(b, a, TM_LT)
+                if handler is not None:
+                    return not toBoolean(self.callMetamethod(handler, b, a))
+        return comparators[op](a, b)
+
+    @staticmethod
+    def binaryMetamethod(a, b, event: int):
+        """
+        handler for event of the first operand, else of the second one
+        """
+        handler = metamethod(a.metatable, event) if type(a) is LuaTable else None
+        if handler is None and type(b) is LuaTable:
+            handler = metamethod(b.metatable, event)
+        return handler
+
+    def callMetamethod(self, handler, *args):
+        """
+        call handler with args on top of the current frame
+        :return: its first result
+        """
+        stack = self.stack
+        stack.check(len(args) + 1)
+        stack.push(handler)
+        for arg in args:
+            stack.push(arg)
+        self.Call(len(args), 1)
+        return stack.pop()
 
     def Len(self, index: int):
-        item = self.stack.get(index)
-        if item.type is LUATYPE.LUA_TSTRING.value:
-            self.stack.push(LuaNumber(len(item.value)))
-        elif item.type is LUATYPE.LUA_TTABLE.value:
-            self.stack.push(LuaNumber(item.value.len()))
+        self.stack.push(self.len(self.stack.get(index)))
+
+    def len(self, item) -> int:
+        itemType = type(item)
+        if itemType is str:
+            return len(item)
+        elif itemType is LuaRope:
+            return item.length
+        elif itemType is LuaTable:
+            if item.metatable is not None:
+                handler = metamethod(item.metatable, TM_LEN)
+                if handler is not None:
+                    return self.callMetamethod(handler, item, item)
+            return item.len()
         else:
             raise TypeError('# operator get error parameter')
 
@@ -336,15 +433,53 @@ class LuaState(LuaVM):
         if num == 0:
             self.stack.push('')
         elif num >= 2:
-            for i in range(1, num):
-                if self.IsString(-1) and self.IsString(-2):
-                    s2 = self.ToString(-1)
-                    s1 = self.ToString(-2)
-                    self.stack.pop()
-                    self.stack.pop()
-                    self.stack.push(LuaString(s1.value + s2.value))
-                else:
-                    raise TypeError('... operation error')
+            self.stack.push(self.concat(self.stack.popN(num)))
+
+    def concat(self, values: list):
+        """
+        convert every operand once and join them, linear in the length of the result;
+        a result longer than a short string is left as a LuaRope of the operands
+        :param values: strings, ropes and numbers
+        :return: str, the interned copy when there is one, or LuaRope
+        """
+        pieces = []
+        length = 0
+        for value in values:
+            valueType = type(value)
+            if valueType is str:
+                pieces.append(value)
+                length += len(value)
+            elif valueType is LuaRope:
+                pieces.append(value)
+                length += value.length
+            elif valueType is int or valueType is float:
+                value = numberToString(value)
+                pieces.append(value)
+                length += len(value)
+            elif valueType is LuaTable:
+                return self.concatMeta(values)
+            else:
+                raise TypeError('attempt to concatenate a {} value'.format(self.TypeName(typeOf(value))))
+        if length > self.LUAI_MAXSHORTLEN:
+            return LuaRope(tuple(pieces), length)
+        return self.lookupString(''.join(pieces))
+
+    def concatMeta(self, values: list):
+        """
+        concat with a table operand: pairs are joined right to left like lua does, a
+        pair with a table goes through the __concat handler of either operand
+        """
+        result = values[-1]
+        for value in reversed(values[:-1]):
+            if type(value) is LuaTable or type(result) is LuaTable:
+                handler = self.binaryMetamethod(value, result, TM_CONCAT)
+                if handler is None:
+                    bad = value if type(value) is LuaTable else result
+                    raise TypeError('attempt to concatenate a {} value'.format(self.TypeName(typeOf(bad))))
+                result = self.callMetamethod(handler, value, result)
+            else:
+                result = self.concat([value, result])
+        return result
 
     def CreateTable(self, narr: int, nrec: int):
         self.stack.push(LuaTable(narr, nrec))
@@ -352,23 +487,47 @@ class LuaState(LuaVM):
     def NewTable(self):
         self.CreateTable(0, 0)
 
-    def getTable(self, t: LuaTable, key: LuaValue) -> LuaValue:
-        if t.type is not LUATYPE.LUA_TTABLE.value:
-            raise TypeError('get value from a element not a table')
-        value = t.get(key)
+    def getTable(self, t: LuaTable, key):
+        if type(t) is LuaTable:
+            value = t.get(key)
+            if value is not None or t.metatable is None:
+                return value
+        return self.index(t, key)
+
+    def index(self, t, key):
+        """
+        t[key] for a key t lacks: follow __index handlers, a table is indexed
+        in turn and a function called with (t, key)
+        """
+        for _ in range(self.MAXTAGLOOP):
+            if type(t) is not LuaTable:
+                raise TypeError('get value from a element not a table')
+            value = t.get(key)
+            if value is not None:
+                return value
+            handler = metamethod(t.metatable, TM_INDEX)
+            if handler is None:
+                return None
+            if type(handler) is LuaClosure:
+                return self.callMetamethod(handler, t, key)
+            t = handler
+        raise RuntimeError("'__index' chain too long; possible loop")
+
+    def pushTable(self, t: LuaTable, key):
+        value = self.getTable(t, key)
         self.stack.push(value)
-        return value.typeOf()
+        return typeOf(value)
 
-    def GetTable(self, index: int) -> LuaValue:
+    def GetTable(self, index: int) -> int:
         t = self.stack.get(index)
         k = self.stack.pop()
-        return self.getTable(t, k)
+        return self.pushTable(t, k)
 
     def GetField(self, index: int, key: LuaString):
-        return self.getTable(self.stack.get(index), key)
+        return self.pushTable(self.stack.get(index), self.internString(unbox(key)))
 
-    def GetI(self, index: int, key: LuaNumber):
-        return self.getTable(self.stack.get(index), key)
+    def GetI(self, index: int, key: int):
+        return self.pushTable(self.stack.get(index), unbox(key))
 
     def SetTable(self, index: int):
         t = self.stack.get(index)
@@ -376,16 +535,99 @@ class LuaState(LuaVM):
         key = self.stack.pop()
         self.setTable(t, key, value)
 
-    def setTable(self, t: LuaTable, key: LuaValue, value: LuaValue):
-        if t.type is not LUATYPE.LUA_TTABLE.value:
-            raise TypeError('set value to a element not a table')
-        t.put(key, value)
+    def setTable(self, t: LuaTable, key, value):
+        if type(t) is LuaTable and t.metatable is None:
+            t.put(key, value)
+        else:
+            self.newIndex(t, key, value)
+
+    def newIndex(self, t, key, value):
+        """
+        t[key] = value through __newindex handlers when t lacks key: a table is
+        assigned in turn and a function called with (t, key, value)
+        """
+        for _ in range(self.MAXTAGLOOP):
+            if type(t) is not LuaTable:
+                raise TypeError('set value to a element not a table')
+            handler = metamethod(t.metatable, TM_NEWINDEX)
+            if handler is None or t.get(key) is not None:
+                t.put(key, value)
+                return
+            if type(handler) is LuaClosure:
+                self.callMetamethod(handler, t, key, value)
+                return
+            t = handler
+        raise RuntimeError("'__newindex' chain too long; possible loop")
 
     def SetField(self, index: int, key: LuaString):
-        self.setTable(self.stack.get(index), key, self.stack.pop())
+        self.setTable(self.stack.get(index), self.internString(unbox(key)), self.stack.pop())
 
     def SetI(self, index: int, key: int):
-        self.setTable(self.stack.get(index), LuaNumber(key), self.stack.pop())
+        self.setTable(self.stack.get(index), unbox(key), self.stack.pop())
+
+    def Next(self, index: int) -> bool:
+        """
+        pop a key and push the key and value of the entry after it in the table at index
+        :return: False with nothing pushed after the last entry
+        """
+        t = self.stack.get(index)
+        if type(t) is not LuaTable:
+            raise TypeError('next over a element not a table')
+        key, value = t.next(self.stack.pop())
+        if key is None:
+            return False
+        self.stack.push(key)
+        self.stack.push(value)
+        return True
+
+    def GetMetatable(self, index: int) -> bool:
+        """
+        push the metatable of the value at index
+        :return: False with nothing pushed when it has none
+        """
+        value = self.stack.get(index)
+        mt = value.metatable if type(value) is LuaTable else None
+        if mt is None:
+            return False
+        self.stack.push(mt)
+        return True
+
+    def SetMetatable(self, index: int):
+        """
+        pop a table or nil and make it the metatable of the table at index
+        """
+        t = self.stack.get(index)
+        mt = self.stack.pop()
+        if type(t) is not LuaTable:
+            raise TypeError('set metatable of a element not a table')
+        if mt is not None and type(mt) is not LuaTable:
+            raise TypeError('metatable must be a table or nil')
+        t.metatable = mt
+
+    def RawGet(self, index: int) -> int:
+        t = self.stack.get(index)
+        if type(t) is not LuaTable:
+            raise TypeError('get value from a element not a table')
+        value = t.get(self.stack.pop())
+        self.stack.push(value)
+        return typeOf(value)
+
+    def RawSet(self, index: int):
+        t = self.stack.get(index)
+        value = self.stack.pop()
+        key = self.stack.pop()
+        if type(t) is not LuaTable:
+            raise TypeError('set value to a element not a table')
+        t.put(key, value)
+
+    def RawEqual(self, idx1: int, idx2: int) -> bool:
+        return LuaValue.eq(self.stack.get(idx1), self.stack.get(idx2))
+
+    def RawLen(self, index: int) -> int:
+        value = self.stack.get(index)
+        if type(value) is LuaTable:
+            return value.len()
+        return self.len(value)
 
     def pushLuaStack(self, stack: LuaStack):
         stack.prev = self.stack
@@ -398,9 +640,13 @@ class LuaState(LuaVM):
 
     def Load(self, chunk, chunkName: str, mode: str):
         from readChunk import HandleFile
-        handleFile = HandleFile(chunk)
-        handleFile.readHead()
-        proto = handleFile.readProtos(0)
+        with HandleFile(chunk, self.internString) as handleFile:
+            handleFile.readHead()
+            proto = handleFile.readProtos(0)
+        if self.fuse:
+            fuseProto(proto)
+        if self.jit:
+            compileProto(proto)
         closure = LuaClosure(proto)
         self.stack.push(closure)
         if len(proto.upvalues) > 0:
@@ -409,47 +655,90 @@ class LuaState(LuaVM):
         return 0
 
     def Call(self, nArgs: int, nResults: int):
-        closure = self.stack.get(-(nArgs + 1))
-        if isinstance(closure, LuaClosure):
-            if closure.pyFunc is None:
-                # print("call {}<{},{}>".format(closure.value.source, closure.value.lineDef, closure.value.lastLineDef))
-                self.callLuaClosure(nArgs, nResults, closure)
-            else:
-                self.callPyClosure(nArgs, nResults, closure)
+        stack = self.stack
+        funcIdx = stack.base + stack.top - nArgs - 1
+        stack.top = funcIdx - stack.base + self.callFunction(funcIdx, nArgs, nResults)
+
+    def callFunction(self, funcIdx: int, nArgs: int, nResults: int) -> int:
+        """
+        call the function at slots[funcIdx] with the nArgs values above it as
+        arguments, the callee frame starts right after the function so the
+        arguments are already in place; results are moved down to funcIdx
+        :param funcIdx: absolute index in the register file
+        :param nArgs:
+        :param nResults: wanted results, -1 for all of them
+        :return: number of results stored from funcIdx on
+        """
+        closure = self.slots[funcIdx]
+        if not isinstance(closure, LuaClosure):
+            closure = self.callable(funcIdx, nArgs)
+            nArgs += 1
+        if closure.pyFunc is None:
+            start, n = self.callLuaClosure(funcIdx, nArgs, closure)
         else:
+            start, n = self.callPyClosure(funcIdx, nArgs, closure)
+        slots = self.slots
+        if nResults < 0:
+            nResults = n
+        elif n > nResults:
+            n = nResults
+        slots[funcIdx:funcIdx + n] = slots[start:start + n]
+        if n < nResults:
+            end = funcIdx + nResults
+            if end > len(slots):
+                slots.extend([None] * (end - len(slots)))
+            slots[funcIdx + n:end] = [None] * (nResults - n)
+        return nResults
+
+    def callable(self, funcIdx: int, nArgs: int) -> LuaClosure:
+        """
+        put the __call handler of the value at slots[funcIdx] in its place, the
+        value becomes the first argument
+        :return: the handler
+        """
+        value = self.slots[funcIdx]
+        handler = metamethod(value.metatable, TM_CALL) if type(value) is LuaTable else None
+        if not isinstance(handler, LuaClosure):
             raise TypeError('call element is not function')
-
-    def callLuaClosure(self, nArgs: int, nResults: int, closure: LuaClosure):
-        nRegs = closure.value.maxStackSize
-        nParams = closure.value.numParms
-        newStack = LuaStack(nRegs + 20, self)
+        slots = self.slots
+        end = funcIdx + nArgs + 2
+        if end > len(slots):
+            slots.extend([None] * (end - len(slots)))
+        slots[funcIdx + 1:end] = slots[funcIdx:end - 1]
+        slots[funcIdx] = handler
+        return handler
+
+    def callLuaClosure(self, funcIdx: int, nArgs: int, closure: LuaClosure) -> (int, int):
+        proto = closure.value
+        nRegs = proto.maxStackSize
+        nParams = proto.numParms
+        base = funcIdx + 1
+        slots = self.slots
+        newStack = LuaStack(slots, base, self)
         newStack.closure = closure
-        funcAndArgs = self.stack.popN(nArgs + 1)
-        newStack.pushN(funcAndArgs[1:], nParams)
+        newStack.consts = proto.constants
+        newStack.check(nRegs + self.LUA_MINSTACK)
+        if proto.isVararg:
+            newStack.varargs = slots[base + nParams:base + nArgs]
+        if nArgs > nParams:
+            slots[base + nParams:base + nArgs] = [None] * (nArgs - nParams)
+        elif nArgs < nParams:
+            slots[base + nArgs:base + nParams] = [None] * (nParams - nArgs)
         newStack.top = nRegs
-        if nArgs > nParams and closure.value.isVararg:
-            newStack.varargs = funcAndArgs[nParams + 1:]
         self.pushLuaStack(newStack)
         self.runLuaClosure()
         self.popLuaStack()
-        if nResults is not 0 :
-            results = newStack.popN(newStack.top - nRegs)
-            self.stack.check(len(results))
-            self.stack.pushN(results, nResults)
+        return base + newStack.retBase, newStack.top - newStack.retBase
 
-    def callPyClosure(self, nArgs: int, nResults: int, closure: LuaClosure):
-        newStack = LuaStack(nArgs + 20,self)
+    def callPyClosure(self, funcIdx: int, nArgs: int, closure: LuaClosure) -> (int, int):
+        newStack = LuaStack(self.slots, funcIdx + 1, self)
         newStack.closure = closure
-        args = self.stack.popN(nArgs)
-        newStack.pushN(args, nArgs)
-        self.stack.pop()
+        newStack.top = nArgs
+        newStack.check(self.LUA_MINSTACK)
         self.pushLuaStack(newStack)
         result = closure.pyFunc(self)
         self.popLuaStack()
-        if nResults is not 0:
-            results = newStack.popN(result)
-            self.stack.check(len(results))
-            self.stack.pushN(results, nResults)
+        return newStack.base + newStack.top - result, result
 
     def PushPyFunction(self, func):
         self.stack.push(LuaClosure(None, func))
@@ -476,23 +765,30 @@ class LuaState(LuaVM):
         return None
 
     def runLuaClosure(self):
-        while True:
-            inst = Instruction(self.Fetch())
-            inst.execute(self)
-            if inst.getOpcode() is OPCODE.OP_RETURN.value:
-                break
+        proto = self.stack.closure.value
+        if proto.compiled:
+            proto.compiled(self)
+            return
+        # pc lives in a local: handlers get the next pc and return where to
+        # continue, RETURN hands back None
+        insts = proto.insts
+        handlers = dispatch
+        pc = 0
+        while pc is not None:
+            inst = insts[pc]
+            pc = handlers[inst[0]](self, inst, pc + 1)
 
     def PushGlobalTable(self):
         globalValue = self.registry.get(LuaState.T_LUA_RIDX_GLOBALS)
         self.stack.push(globalValue)
 
     def GetBlobal(self, name: LuaString):
-        return self.getTable(self.registry.get(LuaState.T_LUA_RIDX_GLOBALS), name)
+        return self.pushTable(self.registry.get(LuaState.T_LUA_RIDX_GLOBALS), self.internString(unbox(name)))
 
     def SetGlobal(self, name: LuaString):
         table = self.registry.get(LuaState.T_LUA_RIDX_GLOBALS)
         value = self.stack.pop()
-        self.setTable(table, name, value)
+        self.setTable(table, self.internString(unbox(name)), value)
 
     def Register(self, name:LuaString, func):
         self.PushPyFunction(func)
@@ -0,0 +1,159 @@
+from lvalue import LUATYPE
+
+
+def checkTable(ls, arg: int, name: str):
+    """
+    raise the lua argument error unless argument arg is a table
+    """
+    t = ls.Type(arg)
+    if t != LUATYPE.LUA_TTABLE.value:
+        raise TypeError("bad argument #{} to '{}' (table expected, got {})".format(arg, name, ls.TypeName(t)))
+
+
+def luaNext(ls) -> int:
+    """
+    next(table [, key]): the entry after key, nil after the last one
+    """
+    checkTable(ls, 1, 'next')
+    ls.SetTop(2)
+    if ls.Next(1):
+        return 2
+    ls.PushNil()
+    return 1
+
+
+def luaPairs(ls) -> int:
+    """
+    pairs(t): next, t, nil
+    """
+    checkTable(ls, 1, 'pairs')
+    ls.PushPyFunction(luaNext)
+    ls.PushValue(1)
+    ls.PushNil()
+    return 3
+
+
+def ipairsAux(ls) -> int:
+    """
+    iterator of ipairs: i + 1, t[i + 1], nothing once t[i + 1] is nil
+    """
+    i = ls.ToInteger(2) + 1
+    ls.PushInteger(i)
+    return 1 if ls.GetI(1, i) == LUATYPE.LUA_TNIL.value else 2
+
+
+def luaIpairs(ls) -> int:
+    """
+    ipairs(t): ipairsAux, t, 0
+    """
+    if ls.Type(1) == LUATYPE.LUA_TNONE.value:
+        raise TypeError("bad argument #1 to 'ipairs' (value expected)")
+    ls.PushPyFunction(ipairsAux)
+    ls.PushValue(1)
+    ls.PushInteger(0)
+    return 3
+
+
+def checkAny(ls, arg: int, name: str):
+    """
+    raise the lua argument error when argument arg is missing
+    """
+    if ls.Type(arg) == LUATYPE.LUA_TNONE.value:
+        raise TypeError("bad argument #{} to '{}' (value expected)".format(arg, name))
+
+
+def pushMetafield(ls, index: int, field: str) -> bool:
+    """
+    push the raw field of the metatable of the value at index
+    :return: False with nothing pushed when there is no metatable or no such field
+    """
+    if not ls.GetMetatable(index):
+        return False
+    ls.PushString(field)
+    if ls.RawGet(-2) == LUATYPE.LUA_TNIL.value:
+        ls.Pop(2)
+        return False
+    ls.Remove(-2)
+    return True
+
+
+def luaGetmetatable(ls) -> int:
+    """
+    getmetatable(object): the __metatable field of its metatable when set, else the metatable
+    """
+    checkAny(ls, 1, 'getmetatable')
+    if not ls.GetMetatable(1):
+        ls.PushNil()
+    elif pushMetafield(ls, 1, '__metatable'):
+        ls.Remove(-2)
+    return 1
+
+
+def luaSetmetatable(ls) -> int:
+    """
+    setmetatable(table, metatable): table, a metatable with a __metatable field is protected
+    """
+    checkTable(ls, 1, 'setmetatable')
+    t = ls.Type(2)
+    if t != LUATYPE.LUA_TNIL.value and t != LUATYPE.LUA_TTABLE.value:
+        raise TypeError("bad argument #2 to 'setmetatable' (nil or table expected)")
+    if pushMetafield(ls, 1, '__metatable'):
+        raise TypeError('cannot change a protected metatable')
+    ls.SetTop(2)
+    ls.SetMetatable(1)
+    return 1
+
+
+def luaRawget(ls) -> int:
+    """
+    rawget(table, index): table[index] without metamethods
+    """
+    checkTable(ls, 1, 'rawget')
+    checkAny(ls, 2, 'rawget')
+    ls.SetTop(2)
+    ls.RawGet(1)
+    return 1
+
+
+def luaRawset(ls) -> int:
+    """
+    rawset(table, index, value): table[index] = value without metamethods, returns table
+    """
+    checkTable(ls, 1, 'rawset')
+    checkAny(ls, 2, 'rawset')
+    checkAny(ls, 3, 'rawset')
+    ls.SetTop(3)
+    ls.RawSet(1)
+    return 1
+
+
+def luaRawequal(ls) -> int:
+    """
+    rawequal(v1, v2): v1 == v2 without metamethods
+    """
+    checkAny(ls, 1, 'rawequal')
+    checkAny(ls, 2, 'rawequal')
+    ls.PushBoolean(ls.RawEqual(1, 2))
+    return 1
+
+
+def luaRawlen(ls) -> int:
+    """
+    rawlen(v): length of a table or string without metamethods
+    """
+    t = ls.Type(1)
+    if t != LUATYPE.LUA_TTABLE.value and t != LUATYPE.LUA_TSTRING.value:
+        raise TypeError("bad argument #1 to 'rawlen' (table or string expected)")
+    ls.PushInteger(ls.RawLen(1))
+    return 1
+
+
+# global name -> function, registered by every LuaState
+baseFuncs = {'next': luaNext, 'pairs': luaPairs, 'ipairs': luaIpairs, 'getmetatable': luaGetmetatable,
+             'setmetatable': luaSetmetatable, 'rawget': luaRawget, 'rawset': luaRawset, 'rawequal': luaRawequal,
+             'rawlen': luaRawlen}
+
+
+def openBase(ls):
+    for name, func in baseFuncs.items():
+        ls.Register(name, func)
@@ -0,0 +1,309 @@
+from lmath import FbToInt
+from lop import OPCODE, UNBOUND, bindField, comparators, decodeCode, dispatch, forPrep
+from ltable import LuaTable
+from lvalue import arithMatrices
+
+# opcodes the translator turns into python statements
+NATIVE = {OPCODE.OP_MOVE.value, OPCODE.OP_LOADK.value, OPCODE.OP_LOADKX.value, OPCODE.OP_LOADBOOL.value,
+          OPCODE.OP_LOADNIL.value, OPCODE.OP_GETUPVAL.value, OPCODE.OP_GETTABUP.value, OPCODE.OP_GETTABLE.value,
+          OPCODE.OP_SETTABUP.value, OPCODE.OP_SETUPVAL.value, OPCODE.OP_SETTABLE.value, OPCODE.OP_NEWTABLE.value,
+          OPCODE.OP_SELF.value, OPCODE.OP_NOT.value, OPCODE.OP_LEN.value, OPCODE.OP_JMP.value,
+          OPCODE.OP_EQ.value, OPCODE.OP_LT.value, OPCODE.OP_LE.value, OPCODE.OP_TEST.value,
+          OPCODE.OP_TESTSET.value, OPCODE.OP_FORLOOP.value, OPCODE.OP_FORPREP.value, OPCODE.OP_TFORLOOP.value,
+          OPCODE.OP_EXTRAARG.value}
+NATIVE.update(range(OPCODE.OP_ADD.value, OPCODE.OP_BNOT.value + 1))
+
+# opcodes run by their interpreter handler, with registers spilled to the frame around the call
+DELEGATED = {OPCODE.OP_CONCAT.value, OPCODE.OP_CALL.value, OPCODE.OP_TAILCALL.value, OPCODE.OP_RETURN.value,
+             OPCODE.OP_SETLIST.value, OPCODE.OP_CLOSURE.value, OPCODE.OP_VARARG.value, OPCODE.OP_TFORCALL.value}
+
+# instructions after which control does not simply fall through
+BRANCHES = {OPCODE.OP_JMP.value, OPCODE.OP_EQ.value, OPCODE.OP_LT.value, OPCODE.OP_LE.value,
+            OPCODE.OP_TEST.value, OPCODE.OP_TESTSET.value, OPCODE.OP_FORLOOP.value, OPCODE.OP_FORPREP.value,
+            OPCODE.OP_TFORLOOP.value, OPCODE.OP_RETURN.value}
+
+COMPARES = {OPCODE.OP_EQ.value: 'EQ', OPCODE.OP_LT.value: 'LT', OPCODE.OP_LE.value: 'LE'}
+
+NAMESPACE = {'EQ': comparators[0], 'LT': comparators[1], 'LE': comparators[2], 'forPrep': forPrep,
+             'LuaTable': LuaTable, 'H': dispatch, 'bindField': bindField}
+NAMESPACE.update(('O{}'.format(i), matrix) for i, matrix in enumerate(arithMatrices))
+
+
+class Translator:
+    """
+    translate one Proto into the source of a python function run(vm)
+    registers live in python locals r0..rN, jumps become a pc switch made of
+    consecutive `if pc == leader` blocks: falling through or jumping forward
+    just lets the following tests run, jumping backward continues the loop
+    """
+
+    def __init__(self, proto):
+        self.proto = proto
+        self.insts = decodeCode(proto.code)
+        self.nregs = proto.maxStackSize
+        self.lines = []
+        # True while the frame slots, not the locals, hold the current registers
+        self.stale = False
+        # field caches C[i] of the GETTABLE / SETTABLE / SELF with a constant string key, see lop.getfield
+        self.caches = 0
+
+    def reg(self, x):
+        return 'r{}'.format(x)
+
+    def rk(self, x):
+        return self.reg(x) if x >= 0 else 'K[{}]'.format(-1 - x)
+
+    @staticmethod
+    def truth(x, expected):
+        """
+        python test for the lua truthiness of x being expected, only nil and false are false
+        """
+        if expected:
+            return '{0} is not None and {0} is not False'.format(x)
+        return '({0} is None or {0} is False)'.format(x)
+
+    def leaders(self):
+        insts = self.insts
+        result = {0}
+        for pc, (op, a, b, c) in enumerate(insts):
+            if op == OPCODE.OP_JMP.value or op == OPCODE.OP_FORLOOP.value or op == OPCODE.OP_FORPREP.value or \
+                    op == OPCODE.OP_TFORLOOP.value:
+                result.add(pc + 1 + b)
+            elif op == OPCODE.OP_LOADBOOL.value and c != 0:
+                result.add(pc + 2)
+            elif op in COMPARES or op == OPCODE.OP_TEST.value or op == OPCODE.OP_TESTSET.value:
+                result.add(pc + 2)
+            if op in BRANCHES or op == OPCODE.OP_LOADBOOL.value and c != 0:
+                result.add(pc + 1)
+        return sorted(i for i in result if i < len(insts))
+
+    def fieldKey(self, x):
+        """
+        :return: True when RK operand x is a constant string, a key a field cache applies to
+        """
+        return x < 0 and type(self.proto.constants[-1 - x]) is str
+
+    def cachedGet(self, depth, target, table, key):
+        """
+        target = table[key] guarded by the shape of table, as lop.getfield does
+        """
+        emit = self.emit
+        emit(depth, 'cache = C[{}]'.format(self.caches))
+        self.caches += 1
+        emit(depth, 'if type({0}) is LuaTable and {0}.shape is cache[0]:'.format(table))
+        emit(depth + 1, '{} = {}.values[cache[1]]'.format(target, table))
+        emit(depth, 'else:')
+        emit(depth + 1, 'bindField({}, {}, cache)'.format(table, key))
+        emit(depth + 1, '{} = vm.getTable({}, {})'.format(target, table, key))
+
+    def emit(self, depth, line):
+        self.lines.append('    ' * depth + line)
+
+    def goto(self, depth, pc, target):
+        self.emit(depth, 'pc = {}'.format(target))
+        if target <= pc:
+            self.emit(depth, 'continue')
+
+    def spill(self, depth):
+        if self.nregs and not self.stale:
+            self.emit(depth, 'slots[base:base + {}] = [{}]'.format(self.nregs,
+                                                                 ', '.join(map(self.reg, range(self.nregs)))))
+        self.stale = True
+
+    def reload(self, depth):
+        if self.nregs and self.stale:
+            self.emit(depth, '{}, = slots[base:base + {}]'.format(', '.join(map(self.reg, range(self.nregs))),
+                                                                  self.nregs))
+        self.stale = False
+
+    def jumpTarget(self, pc):
+        """
+        target and A operand of the JMP at pc, or None when pc is not a JMP
+        """
+        if pc < len(self.insts) and self.insts[pc][0] == OPCODE.OP_JMP.value:
+            _, a, sBx, _ = self.insts[pc]
+            return pc + 1 + sBx, a
+        return None
+
+    def conditional(self, depth, pc, condition):
+        """
+        branch of EQ/LT/LE/TEST: when condition holds the following JMP is taken, otherwise it is skipped
+        """
+        jump = self.jumpTarget(pc + 1)
+        self.emit(depth, 'if {}:'.format(condition))
+        if jump is None:
+            self.goto(depth + 1, pc, pc + 1)
+        else:
+            target, ja = jump
+            if ja != 0:
+                self.emit(depth + 1, 'vm.CloseUpValues({})'.format(ja))
+            self.goto(depth + 1, pc, target)
+        self.emit(depth, 'else:')
+        self.goto(depth + 1, pc, pc + 2)
+
+    def instruction(self, depth, pc):
+        """
+        emit one instruction, return True when it ends the block
+        """
+        op, a, b, c = self.insts[pc]
+        R, RK, emit = self.reg, self.rk, self.emit
+        if op not in DELEGATED:
+            self.reload(depth)
+        if op == OPCODE.OP_MOVE.value:
+            emit(depth, '{} = {}'.format(R(a), R(b)))
+        elif op == OPCODE.OP_LOADK.value or op == OPCODE.OP_LOADKX.value:
+            emit(depth, '{} = K[{}]'.format(R(a), b))
+        elif op == OPCODE.OP_LOADBOOL.value:
+            emit(depth, '{} = {}'.format(R(a), b != 0))
+            if c != 0:
+                self.goto(depth, pc, pc + 2)
+                return True
+        elif op == OPCODE.OP_LOADNIL.value:
+            emit(depth, '{} = None'.format(' = '.join(R(i) for i in range(a, a + b + 1))))
+        elif op == OPCODE.OP_GETUPVAL.value:
+            emit(depth, '{} = UV[{}]'.format(R(a), b))
+        elif op == OPCODE.OP_SETUPVAL.value:
+            emit(depth, 'UV[{}] = {}'.format(b, R(a)))
+        elif op == OPCODE.OP_GETTABUP.value:
+            emit(depth, '{} = vm.getTable(UV[{}], {})'.format(R(a), b, RK(c)))
+        elif op == OPCODE.OP_SETTABUP.value:
+            emit(depth, 'vm.setTable(UV[{}], {}, {})'.format(a, RK(b), RK(c)))
+        elif op == OPCODE.OP_GETTABLE.value and self.fieldKey(c):
+            self.cachedGet(depth, R(a), R(b), RK(c))
+        elif op == OPCODE.OP_GETTABLE.value:
+            emit(depth, '{} = vm.getTable({}, {})'.format(R(a), R(b), RK(c)))
+        elif op == OPCODE.OP_SETTABLE.value and self.fieldKey(b):
+            emit(depth, 'cache = C[{}]'.format(self.caches))
+            self.caches += 1
+            emit(depth, 'if {1} is not None and type({0}) is LuaTable and {0}.shape is cache[0]:'.format(R(a), RK(c)))
+            emit(depth + 1, '{}.values[cache[1]] = {}'.format(R(a), RK(c)))
+            emit(depth, 'else:')
+            emit(depth + 1, 'vm.setTable({}, {}, {})'.format(R(a), RK(b), RK(c)))
+            emit(depth + 1, 'bindField({}, {}, cache)'.format(R(a), RK(b)))
+        elif op == OPCODE.OP_SETTABLE.value:
+            emit(depth, 'vm.setTable({}, {}, {})'.format(R(a), RK(b), RK(c)))
+        elif op == OPCODE.OP_NEWTABLE.value:
+            emit(depth, '{} = LuaTable({}, {})'.format(R(a), FbToInt(b), FbToInt(c)))
+        elif op == OPCODE.OP_SELF.value:
+            emit(depth, '{} = {}'.format(R(a + 1), R(b)))
+            if self.fieldKey(c):
+                self.cachedGet(depth, R(a), R(a + 1), RK(c))
+            else:
+                emit(depth, '{} = vm.getTable({}, {})'.format(R(a), R(a + 1), RK(c)))
+        elif OPCODE.OP_ADD.value <= op <= OPCODE.OP_SHR.value:
+            # the arithMatrices handler of the operand types inline, anything else through vm.arith
+            emit(depth, 'typed = O{}.get((type({}), type({})))'.format(op - OPCODE.OP_ADD.value, RK(b), RK(c)))
+            emit(depth, '{0} = typed({1}, {2}) if typed is not None else vm.arith({1}, {2}, {3})'.format(
+                R(a), RK(b), RK(c), op - OPCODE.OP_ADD.value))
+        elif op == OPCODE.OP_UNM.value or op == OPCODE.OP_BNOT.value:
+            emit(depth, 'typed = O{}.get(type({}))'.format(op - OPCODE.OP_ADD.value, R(b)))
+            emit(depth, '{0} = typed({1}) if typed is not None else vm.unaryArith({1}, {2})'.format(
+                R(a), R(b), op - OPCODE.OP_ADD.value))
+        elif op == OPCODE.OP_NOT.value:
+            emit(depth, '{0} = {1} is None or {1} is False'.format(R(a), R(b)))
+        elif op == OPCODE.OP_LEN.value:
+            emit(depth, '{} = vm.len({})'.format(R(a), R(b)))
+        elif op == OPCODE.OP_JMP.value:
+            if a != 0:
+                emit(depth, 'vm.CloseUpValues({})'.format(a))
+            self.goto(depth, pc, pc + 1 + b)
+            return True
+        elif op in COMPARES:
+            compare = '{}({}, {})'.format(COMPARES[op], RK(b), RK(c))
+            # constants are never tables, a table register operand may have comparison metamethods
+            tables = ' or '.join('type({}) is LuaTable'.format(R(x)) for x in (b, c) if x >= 0)
+            if tables:
+                compare = '(vm.compare({}, {}, {}) if {} else {})'.format(RK(b), RK(c), op - OPCODE.OP_EQ.value,
+                                                                          tables, compare)
+            self.conditional(depth, pc, '{} == {}'.format(compare, a != 0))
+            return True
+        elif op == OPCODE.OP_TEST.value:
+            self.conditional(depth, pc, self.truth(R(a), c != 0))
+            return True
+        elif op == OPCODE.OP_TESTSET.value:
+            emit(depth, 'if {}:'.format(self.truth(R(b), c != 0)))
+            emit(depth + 1, '{} = {}'.format(R(a), R(b)))
+            self.goto(depth + 1, pc, pc + 1)
+            emit(depth, 'else:')
+            self.goto(depth + 1, pc, pc + 2)
+            return True
+        elif op == OPCODE.OP_FORPREP.value:
+            emit(depth, '{0}, {1}, {2} = forPrep({0}, {1}, {2})'.format(R(a), R(a + 1), R(a + 2)))
+            self.goto(depth, pc, pc + 1 + b)
+            return True
+        elif op == OPCODE.OP_FORLOOP.value:
+            emit(depth, '{0} += {1}'.format(R(a), R(a + 2)))
+            emit(depth, 'if ({0} <= {1}) if {2} > 0 else ({1} <= {0}):'.format(R(a), R(a + 1), R(a + 2)))
+            emit(depth + 1, '{} = {}'.format(R(a + 3), R(a)))
+            self.goto(depth + 1, pc, pc + 1 + b)
+            emit(depth, 'else:')
+            self.goto(depth + 1, pc, pc + 1)
+            return True
+        elif op == OPCODE.OP_TFORLOOP.value:
+            emit(depth, 'if {} is not None:'.format(R(a + 1)))
+            emit(depth + 1, '{} = {}'.format(R(a), R(a + 1)))
+            self.goto(depth + 1, pc, pc + 1 + b)
+            emit(depth, 'else:')
+            self.goto(depth + 1, pc, pc + 1)
+            return True
+        elif op == OPCODE.OP_EXTRAARG.value:
+            pass
+        elif op in DELEGATED:
+            self.spill(depth)
+            emit(depth, 'H[{}](vm, I[{}], {})'.format(op, pc, pc + 1))
+            if op == OPCODE.OP_RETURN.value:
+                emit(depth, 'return')
+                return True
+        return False
+
+    def translate(self) -> str or None:
+        """
+        :return: python source, or None when the proto uses an opcode that cannot be translated
+        """
+        if any(inst[0] not in NATIVE and inst[0] not in DELEGATED for inst in self.insts):
+            return None
+        emit = self.emit
+        emit(0, 'def run(vm):')
+        emit(1, 'stack = vm.stack')
+        emit(1, 'slots = stack.slots')
+        emit(1, 'base = stack.base')
+        emit(1, 'K = stack.consts')
+        emit(1, 'UV = stack.closure.upvalues')
+        self.stale = True
+        self.reload(1)
+        emit(1, 'pc = 0')
+        emit(1, 'while True:')
+        leaders = self.leaders()
+        for i, start in enumerate(leaders):
+            end = leaders[i + 1] if i + 1 < len(leaders) else len(self.insts)
+            emit(2, 'if pc == {}:'.format(start))
+            terminated = False
+            for pc in range(start, end):
+                if self.instruction(3, pc):
+                    terminated = True
+                    break
+            if not terminated:
+                self.reload(3)
+                self.goto(3, end - 1, end)
+            self.stale = False
+        return '\n'.join(self.lines) + '\n'
+
+
+def compileProto(proto):
+    """
+    translate proto and its nested protos to python functions cached on
+    Proto.compiled; a proto that cannot be translated gets False and keeps
+    running in the interpreter
+    :param proto: Proto
+    :return:
+    """
+    translator = Translator(proto)
+    source = translator.translate()
+    if source is None:
+        proto.compiled = False
+    else:
+        namespace = dict(NAMESPACE, I=decodeCode(proto.code), C=[[UNBOUND, 0] for _ in range(translator.caches)])
+        exec(compile(source, '<lua {}:{}>'.format(proto.source, proto.lineDef), 'exec'), namespace)
+        proto.compiled = namespace['run']
+    for p in proto.protos:
+        compileProto(p)
@@ -42,3 +42,70 @@ def FbToInt(x: int) -> int:
         return x
     else:
         return ((x & 7) + 8) << abs((x >> 3) - 1)
+
+
+def IntFloorDiv(a: int, b: int) -> int:
+    if b == 0:
+        raise ZeroDivisionError("attempt to perform 'n//0'")
+    return a // b
+
+
+def IntMod(a: int, b: int) -> int:
+    # python's % already takes the sign of the divisor, as lua's does
+    if b == 0:
+        raise ZeroDivisionError("attempt to perform 'n%0'")
+    return a % b
+
+
+def FloatDiv(a: float, b: float) -> float:
+    try:
+        return a / b
+    except ZeroDivisionError:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+def FloatFloorDiv(a: float, b: float) -> float:
+    q = FloatDiv(a, b)
+    return float(math.floor(q)) if math.isfinite(q) else q
+
+
+def FloatMod(a: float, b: float) -> float:
+    if b == 0:
+        return math.nan
+    return a % b
+
+
+def FloatPow(a: float, b: float) -> float:
+    try:
+        return math.pow(a, b)
+    except OverflowError:
+        return -math.inf if a < 0 and b % 2 == 1 else math.inf
+    except ValueError:
+        # 0 to a negative power, or a negative base to a fractional power
+        if a == 0:
+            return -math.inf if math.copysign(1.0, a) < 0 and b % 2 == 1 else math.inf
+        return math.nan
+
+
+iadd = fadd = lambda a, b: a + b
+isub = fsub = lambda a, b: a - b
+imul = fmul = lambda a, b: a * b
+imod = IntMod
+fmod = FloatMod
+lpow = FloatPow
+div = FloatDiv
+iidiv = IntFloorDiv
+fidiv = FloatFloorDiv
+band = lambda a, b: a & b
+bor = lambda a, b: a | b
+bxor = lambda a, b: a ^ b
+shl = ShiftLeft
+shr = ShiftRight
+iunm = funm = lambda a: -a
+bnot = lambda a: ~a
+
+# (integer operator, float operator) indexed by ARIOPENUM value
+arithOperators = [(iadd, fadd), (isub, fsub), (imul, fmul), (imod, fmod), (None, lpow), (None, div), (iidiv, fidiv),
+                  (band, None), (bor, None), (bxor, None), (shl, None), (shr, None), (iunm, funm), (bnot, None)]
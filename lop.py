@@ -1,7 +1,10 @@
+import operator
 from enum import Enum
 
+from lbaselib import ipairsAux, luaNext
 from lmath import FbToInt
 from ltable import LuaTable
+from lvalue import LuaClosure, LuaValue, arithMatrices, convertToFloat
 from lvm import LuaVM
 
 arithoplist = [(j, i) for i, j in enumerate(['LUA_OPADD', 'LUA_OPSUB', 'LUA_OPMUL', 'LUA_OPMOD', 'LUA_OPPOW',
@@ -29,6 +32,30 @@ opcodelist = [(j, i) for i, j in enumerate(['OP_MOVE', 'OP_LOADK', 'OP_LOADKX',
                                             'OP_CLOSURE', 'OP_VARARG', 'OP_EXTRAARG'])]
 OPCODE = Enum('OPCODE', opcodelist)
 
+# internal opcodes produced by fuseCode at load time, numbered after the luac ones
+fusedopcodelist = [(j, i + len(opcodelist)) for i, j in enumerate(['OP_EQJMP', 'OP_LTJMP', 'OP_LEJMP', 'OP_TESTJMP',
+                                                                   'OP_GETTABUPCALL', 'OP_LOADKARITH',
+                                                                   'OP_GETGLOBALCALL'])]
+FUSEDOPCODE = Enum('FUSEDOPCODE', fusedopcodelist)
+
+# internal opcodes produced by cacheFields at load time, GETTABLE / SETTABLE / SELF
+# with a constant string key carrying an inline cache and GETTABUP / SETTABUP on
+# _ENV bound to a global cell, numbered after the fused ones
+cachedopcodelist = [(j, i + len(opcodelist) + len(fusedopcodelist)) for i, j in
+                    enumerate(['OP_GETFIELD', 'OP_SETFIELD', 'OP_SELFFIELD', 'OP_GETGLOBAL', 'OP_SETGLOBAL'])]
+CACHEDOPCODE = Enum('CACHEDOPCODE', cachedopcodelist)
+
+# internal opcodes an ADD / SUB / MUL / EQ / LT / LE site is quickened into at run time,
+# numbered after the cached ones
+quickenedopcodelist = [(j, i + len(opcodelist) + len(fusedopcodelist) + len(cachedopcodelist)) for i, j in
+                       enumerate(['OP_ADD_II', 'OP_ADD_FF', 'OP_ADD_GENERIC',
+                                  'OP_SUB_II', 'OP_SUB_FF', 'OP_SUB_GENERIC',
+                                  'OP_MUL_II', 'OP_MUL_FF', 'OP_MUL_GENERIC',
+                                  'OP_EQ_NUM', 'OP_EQ_STR', 'OP_EQ_GENERIC',
+                                  'OP_LT_NUM', 'OP_LT_STR', 'OP_LT_GENERIC',
+                                  'OP_LE_NUM', 'OP_LE_STR', 'OP_LE_GENERIC'])]
+QUICKENEDOPCODE = Enum('QUICKENEDOPCODE', quickenedopcodelist)
+
 # OpArgN argument is not used
 # OpArgU argument is used
 # OpArgR argument is a register or a jump offset
@@ -61,7 +88,7 @@ opcodes = [Opcode(0, 1, OPARGMODE.OpArgR.value, OPARGMODE.OpArgN.value, OPMODE.I
            Opcode(0, 0, OPARGMODE.OpArgU.value, OPARGMODE.OpArgN.value, OPMODE.IABC.value, "SETUPVAL"),
            Opcode(0, 0, OPARGMODE.OpArgK.value, OPARGMODE.OpArgK.value, OPMODE.IABC.value, "SETTABLE"),
            Opcode(0, 1, OPARGMODE.OpArgU.value, OPARGMODE.OpArgU.value, OPMODE.IABC.value, "NEWTABLE"),
-           Opcode(0, 1, OPARGMODE.OpArgR.value, OPARGMODE.OpArgK.value, OPMODE.IABC.value, "SELF    "),
+           Opcode(0, 1, OPARGMODE.OpArgR.value, OPARGMODE.OpArgK.value, OPMODE.IABC.value, "SELF"),
            Opcode(0, 1, OPARGMODE.OpArgK.value, OPARGMODE.OpArgK.value, OPMODE.IABC.value, "ADD"),
            Opcode(0, 1, OPARGMODE.OpArgK.value, OPARGMODE.OpArgK.value, OPMODE.IABC.value, "SUB"),
            Opcode(0, 1, OPARGMODE.OpArgK.value, OPARGMODE.OpArgK.value, OPMODE.IABC.value, "MUL"),
@@ -87,7 +114,7 @@ opcodes = [Opcode(0, 1, OPARGMODE.OpArgR.value, OPARGMODE.OpArgN.value, OPMODE.I
            Opcode(1, 1, OPARGMODE.OpArgR.value, OPARGMODE.OpArgU.value, OPMODE.IABC.value, "TESTSET"),
            Opcode(0, 1, OPARGMODE.OpArgU.value, OPARGMODE.OpArgU.value, OPMODE.IABC.value, "CALL"),
            Opcode(0, 1, OPARGMODE.OpArgU.value, OPARGMODE.OpArgU.value, OPMODE.IABC.value, "TAILCALL"),
-           Opcode(0, 0, OPARGMODE.OpArgU.value, OPARGMODE.OpArgN.value, OPMODE.IABC.value, "_RETURN"),
+           Opcode(0, 0, OPARGMODE.OpArgU.value, OPARGMODE.OpArgN.value, OPMODE.IABC.value, "RETURN"),
            Opcode(0, 1, OPARGMODE.OpArgR.value, OPARGMODE.OpArgN.value, OPMODE.IAsBx.value, "FORLOOP"),
            Opcode(0, 1, OPARGMODE.OpArgR.value, OPARGMODE.OpArgN.value, OPMODE.IAsBx.value, "FORPREP"),
            Opcode(0, 0, OPARGMODE.OpArgN.value, OPARGMODE.OpArgU.value, OPMODE.IABC.value, "TFORCALL"),
@@ -98,6 +125,19 @@ opcodes = [Opcode(0, 1, OPARGMODE.OpArgR.value, OPARGMODE.OpArgN.value, OPMODE.I
            Opcode(0, 0, OPARGMODE.OpArgU.value, OPARGMODE.OpArgU.value, OPMODE.IAx.value, "EXTRAARG")]
 
 
+# (opMode, B is RK, C is RK) of each opcode, what decodeCode looks at per instruction
+operandModes = [(opcode.opMode, opcode.argBMode == OPARGMODE.OpArgK.value, opcode.argCMode == OPARGMODE.OpArgK.value)
+                for opcode in opcodes]
+
+# enum values the load time passes compare against, the value of an enum member is a property
+IABC, IABX, IASBX = OPMODE.IABC.value, OPMODE.IABx.value, OPMODE.IAsBx.value
+OP_LOADK, OP_LOADKX, OP_GETTABUP, OP_GETTABLE, OP_SETTABUP, OP_SETTABLE, OP_SELF, OP_ADD, OP_SHR, OP_JMP, OP_TEST, \
+    OP_CALL, OP_SETLIST = (OPCODE[name].value for name in (
+        'OP_LOADK', 'OP_LOADKX', 'OP_GETTABUP', 'OP_GETTABLE', 'OP_SETTABUP', 'OP_SETTABLE', 'OP_SELF', 'OP_ADD',
+        'OP_SHR', 'OP_JMP', 'OP_TEST', 'OP_CALL', 'OP_SETLIST'))
+OP_GETFIELD, OP_SETFIELD, OP_SELFFIELD, OP_GETGLOBAL, OP_SETGLOBAL = (member.value for member in CACHEDOPCODE)
+
+
 class Instruction:
     def __init__(self, data):
         self.data = data
@@ -129,7 +169,7 @@ class Instruction:
                 result.append(b)
             if self.getCmode() != OPARGMODE.OpArgN.value:
                 if c > 0xFF:
-                    c = -1 - (b & 0xFF)
+                    c = -1 - (c & 0xFF)
                 result.append(c)
             return result
         elif opmode == OPMODE.IABx.value:
@@ -170,384 +210,1066 @@ class Instruction:
     def getInsInfo(self):
         return '{} {}'.format(self.getOpname(), ' '.join([str(i) for i in self.getOperands()]))
 
-    def move(self, vm):
-        """
-        R（A）：=R（B）
-        :param vm: LuaVM
-        :return:
-        """
-        a, b, _ = self.getAbc()
-        a += 1
-        b += 1
-        vm.Copy(b, a)
-
-    def jmp(self, vm):
-        a, sBx = self.getAsbx()
-        vm.AddPC(sBx)
-        if a != 0:
-            vm.CloseUpValues(a)
-
-    def loadnil(self, vm):
-        """
-        R(A), R(A+1), ..., R(A+B) := nil
-        push nil to the top of stack
-        copy (a+b) times then remove the first nil
-        :param vm: LuaVM
-        :return:
-        """
-        a, b, _ = self.getAbc()
-        a += 1
-        vm.PushNil()
-        for i in range(a, a + b + 1):
-            vm.Copy(-1, i)
-        vm.Pop(1)
-
-    def loadbool(self, vm):
-        """
-        R(A) := (bool)B; if (C) pc++
-        :param vm: LuaVM
-        :return:
-        """
-        a, b, c = self.getAbc()
-        a += 1
-        vm.PushBoolean(b != 0)
-        vm.Replace(a)
-        if c != 0:
-            vm.AddPC(1)
-
-    def loadk(self, vm):
-        """
-
-        :param vm: LuaVM
-        :return:
-        """
-        a, bx = self.getAbx()
-        a += 1
-        vm.GetConst(bx)
-        vm.Replace(a)
-
-    def loadkx(self, vm):
-        """
-        add EXTRAARG op
-        :param vm: LuaVM
-        :return:
-        """
-        a, _ = self.getAbx()
-        a += 1
-        ax = Instruction(vm.Fetch()).getAx()
-        vm.GetConst(ax)
-        vm.Replace(a)
-
-    def binaryrith(self, vm, op):
-        """
-        R(A) := RK(B) op RK(C)
-        :param vm: LuaVM
-        :param op: ArithOp
-        :return:
-        """
-        a, b, c = self.getAbc()
-        a += 1
-        vm.GetRk(b)
-        vm.GetRk(c)
-        vm.Arith(op)
-        vm.Replace(a)
-
-    def unaryArith(self, vm, op):
-        """
-        R(A) := op R(B)
-        :param vm: LuaVM
-        :param op: ArithOp
-        :return:
-        """
-        a, b, _ = self.getAbc()
-        a += 1
-        b += 1
-        vm.PushValue(b)
-        vm.Arith(op)
-        vm.Replace(a)
-
-    def compare(self, vm, op):
-        """
-
-        :param vm: LuaVM
-        :param op: CompareOp
-        :return:
-        """
-        a, b, c = self.getAbc()
-        vm.GetRk(b)
-        vm.GetRk(c)
-        if vm.Compare(-2, -1, op) != (a != 0):
-            vm.AddPC(1)
-        vm.Pop(2)
-
-    add = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPADD.value)
-    sub = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPSUB.value)
-    mul = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPMUL.value)
-    mod = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPMOD.value)
-    pow = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPPOW.value)
-    div = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPDIV.value)
-    idiv = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPIDIV.value)
-    band = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPBAND.value)
-    bor = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPBOR.value)
-    bxor = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPBXOR.value)
-    shl = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPSHL.value)
-    shr = lambda self, vm: self.binaryrith(vm, ARIOPENUM.LUA_OPSHR.value)
-    unm = lambda self, vm: self.unaryArith(vm, ARIOPENUM.LUA_OPUNM.value)
-    bnot = lambda self, vm: self.unaryArith(vm, ARIOPENUM.LUA_OPBNOT.value)
-    eq = lambda self, vm: self.compare(vm, COMOPENUM.LUA_OPEQ.value)
-    lt = lambda self, vm: self.compare(vm, COMOPENUM.LUA_OPLT.value)
-    le = lambda self, vm: self.compare(vm, COMOPENUM.LUA_OPLE.value)
-
-    def len(self, vm):
-        """
-        :param vm: LuaVM
-        :return:
-        """
-        a, b, _ = self.getAbc()
-        a += 1
-        b += 1
-        vm.Len(b)
-        vm.Replace(a)
-
-    def concat(self, vm):
+    def decode(self):
         """
-        :param vm: LuaVM
-        :return:
+        split the instruction into a (opcode, a, b, c) tuple
+        iABx and iAsBx keep bx/sbx in b, iAx keeps ax in a
+        RK operands that refer to a constant are stored as -1 - index
+        :return: tuple
         """
-        a, b, c = self.getAbc()
-        a += 1
-        b += 1
-        c += 1
-        n = c - b + 1
-        vm.CheckStack(n)
-        for i in range(b, c + 1):
-            vm.PushValue(i)
-        vm.Concat(n)
-        vm.Replace(a)
-
-    def lnot(self, vm):
-        """
-        :param vm: LuaVM
-        :return:
-        """
-        a, b, _ = self.getAbc()
-        a += 1
-        b += 1
-        vm.PushBoolean(not vm.ToBoolean(b))
-        vm.Replace(a)
-
-    def testset(self, vm):
-        """
-        :param vm: LuaVM
-        :return:
-        """
-        a, b, c = self.getAbc()
-        a += 1
-        b += 1
-        if vm.ToBoolean(b) == (c != 0):
-            vm.Copy(b, a)
+        op = self.getOpcode()
+        opmode = opcodes[op].opMode
+        if opmode == OPMODE.IABC.value:
+            a, b, c = self.getAbc()
+            if opcodes[op].argBMode == OPARGMODE.OpArgK.value and b > 0xFF:
+                b = -1 - (b & 0xFF)
+            if opcodes[op].argCMode == OPARGMODE.OpArgK.value and c > 0xFF:
+                c = -1 - (c & 0xFF)
+            return op, a, b, c
+        elif opmode == OPMODE.IABx.value:
+            a, bx = self.getAbx()
+            return op, a, bx, 0
+        elif opmode == OPMODE.IAsBx.value:
+            a, sbx = self.getAsbx()
+            return op, a, sbx, 0
+        elif opmode == OPMODE.IAx.value:
+            return op, self.getAx(), 0, 0
         else:
-            vm.AddPC(1)
+            raise TypeError('opmode not support')
 
-    def test(self, vm):
-        """
-        :param vm: LuaVM
-        :return:
-        """
-        a, _, c = self.getAbc()
-        a += 1
-        if vm.ToBoolean(a) != (c != 0):
-            vm.AddPC(1)
 
-    def forprep(self, vm):
-        """
-        :param vm: LuaVM
-        :return:
-        """
-        a, sBx = self.getAsbx()
-        a += 1
-        vm.PushValue(a)
-        vm.PushValue(a + 2)
-        vm.Arith(ARIOPENUM.LUA_OPSUB.value)
-        vm.Replace(a)
-        vm.AddPC(sBx)
-
-    def forloop(self, vm):
-        """
-        :param vm: LuaVM
-        :return:
-        """
-        a, sBx = self.getAsbx()
-        a += 1
-        vm.PushValue(a + 2)
-        vm.PushValue(a)
-        vm.Arith(ARIOPENUM.LUA_OPADD.value)
-        vm.Replace(a)
-        stepOrder = vm.ToNumber(a + 2) >= 0
-        if (stepOrder and vm.Compare(a, a + 1, COMOPENUM.LUA_OPLE.value)) or (
-                (not stepOrder) and vm.Compare(a + 1, a, COMOPENUM.LUA_OPLE.value)):
-            vm.AddPC(sBx)
-            vm.Copy(a, a + 3)
-
-    def newtable(self, vm: LuaVM):
-        a, b, c = self.getAbc()
-        a += 1
-        vm.CreateTable(FbToInt(b), FbToInt(c))
-        vm.Replace(a)
-
-    def gettable(self, vm: LuaVM):
-        a, b, c = self.getAbc()
-        a += 1
-        b += 1
-        vm.GetRk(c)
-        vm.GetTable(b)
-        vm.Replace(a)
-
-    def settable(self, vm: LuaVM):
-        a, b, c = self.getAbc()
-        a += 1
-        vm.GetRk(b)
-        vm.GetRk(c)
-        vm.SetTable(a)
-
-    def setlist(self, vm: LuaVM):
-        a, b, c = self.getAbc()
-        a += 1
-        if c > 0:
-            c -= 1
+def decodeCode(code) -> list:
+    """
+    decode a proto's code once at load time so the interpreter loop
+    works on plain tuples instead of building an Instruction per step
+    operands carried by a trailing EXTRAARG are merged into LOADKX / SETLIST
+    :param code: sequence of raw 32 bit instructions
+    :return: list of (opcode, a, b, c) tuples, indexed by pc
+    """
+    modes = operandModes
+    insts = []
+    append = insts.append
+    # Instruction.decode inlined
+    for i in code:
+        op = i & 0x3F
+        opmode, bConst, cConst = modes[op]
+        if opmode == IABC:
+            b = (i >> 23) & 0x1FF
+            c = (i >> 14) & 0x1FF
+            if bConst and b > 0xFF:
+                b = -1 - (b & 0xFF)
+            if cConst and c > 0xFF:
+                c = -1 - (c & 0xFF)
+            append((op, (i >> 6) & 0xFF, b, c))
+        elif opmode == IABX:
+            append((op, (i >> 6) & 0xFF, i >> 14, 0))
+        elif opmode == IASBX:
+            append((op, (i >> 6) & 0xFF, (i >> 14) - MAXARG_SBX, 0))
         else:
-            c = Instruction(vm.Fetch()).getAx()
-
-        bisZero = b is 0
-        if bisZero:
-            b = (vm.ToInteger(-1)) - a - 1
-            vm.Pop(1)
-
-        vm.CheckStack(1)
-        index = c * LuaTable.LFIELDS_PER_FLUSH
-
-        for i in range(1, b + 1):
-            index += 1
-            vm.PushValue(a + i)
-            vm.SetI(a, index)
-
-        if bisZero:
-            for i in range(vm.RegisterCount() + 1, vm.GetTop() + 1):
-                index += 1
-                vm.PushValue(i)
-                vm.SetI(a, index)
-            vm.SetTop(vm.RegisterCount())
-
-    def closure(self, vm: LuaVM):
-        a, bx = self.getAbx()
-        a += 1
-        vm.LoadProto(bx)
-        vm.Replace(a)
-
-    @staticmethod
-    def _fixStack(a: int, vm: LuaVM):
-        x = vm.ToInteger(-1)
-        vm.Pop(1)
-        vm.CheckStack(x - a)
-        for i in range(a, x):
-            vm.PushValue(i)
-        vm.Rotate(vm.RegisterCount() + 1, x - a)
-
-    def _pushFuncAndArgs(self, a: int, b: int, vm: LuaVM) -> int:
-        if b >= 1:
-            vm.CheckStack(b)
-            for i in range(a, a + b):
-                vm.PushValue(i)
-            return b - 1
+            append((op, i >> 6, 0, 0))
+    for pc, inst in enumerate(insts):
+        op = inst[0]
+        if op == OP_LOADKX:
+            insts[pc] = (op, inst[1], insts[pc + 1][1], 0)
+        elif op == OP_SETLIST and inst[3] == 0:
+            insts[pc] = (op, inst[1], inst[2], insts[pc + 1][1])
+    return insts
+
+
+# every handler takes (vm, inst, pc) where pc already points at the next
+# instruction, and returns the pc to continue from; RETURN returns None
+# register R(x) is vm.stack.slots[vm.stack.base + x], an RK operand x < 0 is consts[-1 - x];
+# only the call / return / vararg family still goes through the LuaState API
+
+
+def move(vm: LuaVM, inst, pc):
+    """
+    R（A）：=R（B）
+    :param vm: LuaVM
+    :param inst: decoded instruction
+    :param pc: next pc
+    :return: next pc
+    """
+    _, a, b, _ = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    slots[base + a] = slots[base + b]
+    return pc
+
+
+def jmp(vm: LuaVM, inst, pc):
+    _, a, sBx, _ = inst
+    if a != 0:
+        vm.CloseUpValues(a)
+    return pc + sBx
+
+
+def loadnil(vm: LuaVM, inst, pc):
+    """
+    R(A), R(A+1), ..., R(A+B) := nil
+    :param vm: LuaVM
+    :param inst: decoded instruction
+    :param pc: next pc
+    :return: next pc
+    """
+    _, a, b, _ = inst
+    stack = vm.stack
+    a += stack.base
+    stack.slots[a:a + b + 1] = [None] * (b + 1)
+    return pc
+
+
+def loadbool(vm: LuaVM, inst, pc):
+    """
+    R(A) := (bool)B; if (C) pc++
+    :param vm: LuaVM
+    :param inst: decoded instruction
+    :param pc: next pc
+    :return: next pc
+    """
+    _, a, b, c = inst
+    stack = vm.stack
+    stack.slots[stack.base + a] = b != 0
+    if c != 0:
+        return pc + 1
+    return pc
+
+
+def loadk(vm: LuaVM, inst, pc):
+    """
+    R(A) := Kst(Bx)
+    :param vm: LuaVM
+    :param inst: decoded instruction
+    :param pc: next pc
+    :return: next pc
+    """
+    _, a, bx, _ = inst
+    stack = vm.stack
+    stack.slots[stack.base + a] = stack.consts[bx]
+    return pc
+
+
+def loadkx(vm: LuaVM, inst, pc):
+    """
+    the constant index comes from the following EXTRAARG, merged at decode time
+    :param vm: LuaVM
+    :param inst: decoded instruction
+    :param pc: next pc
+    :return: next pc
+    """
+    _, a, ax, _ = inst
+    stack = vm.stack
+    stack.slots[stack.base + a] = stack.consts[ax]
+    return pc
+
+
+def extraarg(vm: LuaVM, inst, pc):
+    """
+    operand already merged into the previous instruction
+    """
+    return pc
+
+
+def binaryArith(op):
+    """
+    R(A) := RK(B) op RK(C)
+    :param op: ArithOp
+    :return: handler
+    """
+
+    matrix = arithMatrices[op]
+
+    def handler(vm: LuaVM, inst, pc):
+        _, a, b, c = inst
+        stack = vm.stack
+        slots = stack.slots
+        base = stack.base
+        x = slots[base + b] if b >= 0 else stack.consts[-1 - b]
+        y = slots[base + c] if c >= 0 else stack.consts[-1 - c]
+        typed = matrix.get((type(x), type(y)))
+        slots[base + a] = typed(x, y) if typed is not None else vm.arith(x, y, op)
+        return pc
+
+    return handler
+
+
+def unaryArith(op):
+    """
+    R(A) := op R(B)
+    :param op: ArithOp
+    :return: handler
+    """
+
+    matrix = arithMatrices[op]
+
+    def handler(vm: LuaVM, inst, pc):
+        _, a, b, _ = inst
+        stack = vm.stack
+        slots = stack.slots
+        base = stack.base
+        x = slots[base + b]
+        typed = matrix.get(type(x))
+        slots[base + a] = typed(x) if typed is not None else vm.unaryArith(x, op)
+        return pc
+
+    return handler
+
+
+# LuaValue comparison indexed by COMOPENUM value, a table operand goes to vm.compare for its metamethods
+comparators = [LuaValue.eq, LuaValue.lt, LuaValue.le]
+
+
+# adaptive quickening: the first run of an ADD / SUB / MUL / EQ / LT / LE site looks
+# at its operands and rewrites the site in proto.insts into a variant specialized
+# for them; a specialized variant whose type guard fails rewrites the site into
+# the generic variant for good
+
+
+def _quicken(vm: LuaVM, pc: int, inst):
+    """
+    replace the running instruction, pc already points at the next one
+    """
+    vm.stack.closure.value.insts[pc - 1] = inst
+
+
+def _deoptimize(vm: LuaVM, inst, pc, genericOp: int):
+    inst = (genericOp,) + inst[1:]
+    _quicken(vm, pc, inst)
+    return dispatch[genericOp](vm, inst, pc)
+
+
+def adaptiveArith(op, intOp: int, floatOp: int, genericOp: int):
+    """
+    R(A) := RK(B) op RK(C), quickened by the operand types on first run
+    :param op: ArithOp
+    :param intOp: opcode of the int-int variant
+    :param floatOp: opcode of the float-float variant
+    :param genericOp: opcode of the generic variant
+    :return: handler
+    """
+    generic = binaryArith(op)
+
+    def handler(vm: LuaVM, inst, pc):
+        _, a, b, c = inst
+        stack = vm.stack
+        slots = stack.slots
+        base = stack.base
+        xtype = type(slots[base + b] if b >= 0 else stack.consts[-1 - b])
+        ytype = type(slots[base + c] if c >= 0 else stack.consts[-1 - c])
+        if xtype is int and ytype is int:
+            _quicken(vm, pc, (intOp, a, b, c))
+        elif xtype is float and ytype is float:
+            _quicken(vm, pc, (floatOp, a, b, c))
+        else:
+            _quicken(vm, pc, (genericOp, a, b, c))
+        return generic(vm, inst, pc)
+
+    return handler
+
+
+def specializedArith(pyOp, numType: type, genericOp: int):
+    """
+    R(A) := RK(B) op RK(C) for two numbers of numType
+    :param pyOp: python operator
+    :param numType: int or float
+    :param genericOp: opcode to deoptimize to
+    :return: handler
+    """
+
+    def handler(vm: LuaVM, inst, pc):
+        _, a, b, c = inst
+        stack = vm.stack
+        slots = stack.slots
+        base = stack.base
+        x = slots[base + b] if b >= 0 else stack.consts[-1 - b]
+        y = slots[base + c] if c >= 0 else stack.consts[-1 - c]
+        if type(x) is numType and type(y) is numType:
+            slots[base + a] = pyOp(x, y)
+            return pc
+        return _deoptimize(vm, inst, pc, genericOp)
+
+    return handler
+
+
+def adaptiveCompare(op, numOp: int, strOp: int, genericOp: int):
+    """
+    if ((RK(B) op RK(C)) ~= A) then pc++, quickened by the operand types on first run
+    serves both the plain compare and the fused compare + JMP, a plain compare is
+    quickened into the fused layout with the next pc as jump target
+    :param op: CompareOp
+    :param numOp: opcode of the number-number variant
+    :param strOp: opcode of the string-string variant
+    :param genericOp: opcode of the generic variant
+    :return: handler
+    """
+    comparator = comparators[op]
+
+    def handler(vm: LuaVM, inst, pc):
+        if len(inst) == 4:
+            _, a, b, c = inst
+            target = pc
+            ja = 0
+        else:
+            _, a, b, c, target, ja = inst
+        stack = vm.stack
+        slots = stack.slots
+        base = stack.base
+        x = slots[base + b] if b >= 0 else stack.consts[-1 - b]
+        y = slots[base + c] if c >= 0 else stack.consts[-1 - c]
+        xtype = type(x)
+        ytype = type(y)
+        if (xtype is int or xtype is float) and (ytype is int or ytype is float):
+            _quicken(vm, pc, (numOp, a, b, c, target, ja))
+        elif xtype is str and ytype is str:
+            _quicken(vm, pc, (strOp, a, b, c, target, ja))
         else:
-            self._fixStack(a, vm)
-            return vm.GetTop() - vm.RegisterCount() - 1
-
-    def _popResults(self, a: int, c: int, vm: LuaVM):
-        if c is 1:
-            pass
-        elif c > 1:
-            for i in range(a + c - 2, a - 1, -1):
-                vm.Replace(i)
+            _quicken(vm, pc, (genericOp, a, b, c, target, ja))
+        if xtype is LuaTable or ytype is LuaTable:
+            result = vm.compare(x, y, op)
         else:
-            vm.CheckStack(1)
-            vm.PushInteger(a)
-
-    def _return(self, vm: LuaVM):
-        a, b, _ = self.getAbc()
-        a += 1
-
-        if b is 1:
-            pass
-        elif b > 1:
-            vm.CheckStack(b - 1)
-            for i in range(a, a + b - 1):
-                vm.PushValue(i)
+            result = comparator(x, y)
+        if result != (a != 0):
+            return pc + 1
+        if ja != 0:
+            vm.CloseUpValues(ja)
+        return target
+
+    return handler
+
+
+def specializedCompare(pyOp, types: frozenset, genericOp: int):
+    """
+    compare + jump for two values whose python types are in types
+    (op, A, B, C, jump target, A of JMP)
+    :param pyOp: python comparison operator
+    :param types: accepted python types of the operand values
+    :param genericOp: opcode to deoptimize to
+    :return: handler
+    """
+
+    def handler(vm: LuaVM, inst, pc):
+        _, a, b, c, target, ja = inst
+        stack = vm.stack
+        slots = stack.slots
+        base = stack.base
+        x = slots[base + b] if b >= 0 else stack.consts[-1 - b]
+        y = slots[base + c] if c >= 0 else stack.consts[-1 - c]
+        if type(x) in types and type(y) in types:
+            if pyOp(x, y) != (a != 0):
+                return pc + 1
+            if ja != 0:
+                vm.CloseUpValues(ja)
+            return target
+        return _deoptimize(vm, inst, pc, genericOp)
+
+    return handler
+
+
+add = adaptiveArith(ARIOPENUM.LUA_OPADD.value, QUICKENEDOPCODE.OP_ADD_II.value, QUICKENEDOPCODE.OP_ADD_FF.value,
+                    QUICKENEDOPCODE.OP_ADD_GENERIC.value)
+sub = adaptiveArith(ARIOPENUM.LUA_OPSUB.value, QUICKENEDOPCODE.OP_SUB_II.value, QUICKENEDOPCODE.OP_SUB_FF.value,
+                    QUICKENEDOPCODE.OP_SUB_GENERIC.value)
+mul = adaptiveArith(ARIOPENUM.LUA_OPMUL.value, QUICKENEDOPCODE.OP_MUL_II.value, QUICKENEDOPCODE.OP_MUL_FF.value,
+                    QUICKENEDOPCODE.OP_MUL_GENERIC.value)
+mod = binaryArith(ARIOPENUM.LUA_OPMOD.value)
+lpow = binaryArith(ARIOPENUM.LUA_OPPOW.value)
+div = binaryArith(ARIOPENUM.LUA_OPDIV.value)
+idiv = binaryArith(ARIOPENUM.LUA_OPIDI.value)
+band = binaryArith(ARIOPENUM.LUA_OPBAN.value)
+bor = binaryArith(ARIOPENUM.LUA_OPBOR.value)
+bxor = binaryArith(ARIOPENUM.LUA_OPBXO.value)
+shl = binaryArith(ARIOPENUM.LUA_OPSHL.value)
+shr = binaryArith(ARIOPENUM.LUA_OPSHR.value)
+unm = unaryArith(ARIOPENUM.LUA_OPUNM.value)
+bnot = unaryArith(ARIOPENUM.LUA_OPBNOT.value)
+eq = adaptiveCompare(COMOPENUM.LUA_OPEQ.value, QUICKENEDOPCODE.OP_EQ_NUM.value, QUICKENEDOPCODE.OP_EQ_STR.value,
+                     QUICKENEDOPCODE.OP_EQ_GENERIC.value)
+lt = adaptiveCompare(COMOPENUM.LUA_OPLT.value, QUICKENEDOPCODE.OP_LT_NUM.value, QUICKENEDOPCODE.OP_LT_STR.value,
+                     QUICKENEDOPCODE.OP_LT_GENERIC.value)
+le = adaptiveCompare(COMOPENUM.LUA_OPLE.value, QUICKENEDOPCODE.OP_LE_NUM.value, QUICKENEDOPCODE.OP_LE_STR.value,
+                     QUICKENEDOPCODE.OP_LE_GENERIC.value)
+
+
+def llen(vm: LuaVM, inst, pc):
+    """
+    R(A) := length of R(B)
+    """
+    _, a, b, _ = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    slots[base + a] = vm.len(slots[base + b])
+    return pc
+
+
+def concat(vm: LuaVM, inst, pc):
+    """
+    R(A) := R(B).. ... ..R(C)
+    """
+    _, a, b, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    slots[base + a] = vm.concat(slots[base + b:base + c + 1])
+    return pc
+
+
+def lnot(vm: LuaVM, inst, pc):
+    """
+    R(A) := not R(B)
+    """
+    _, a, b, _ = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    value = slots[base + b]
+    slots[base + a] = value is None or value is False
+    return pc
+
+
+def testset(vm: LuaVM, inst, pc):
+    """
+    if (R(B) <=> C) then R(A) := R(B) else pc++
+    """
+    _, a, b, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    value = slots[base + b]
+    if (value is not None and value is not False) == (c != 0):
+        slots[base + a] = value
+        return pc
+    return pc + 1
+
+
+def test(vm: LuaVM, inst, pc):
+    """
+    if not (R(A) <=> C) then pc++
+    """
+    _, a, _, c = inst
+    stack = vm.stack
+    value = stack.slots[stack.base + a]
+    if (value is not None and value is not False) != (c != 0):
+        return pc + 1
+    return pc
+
+
+def forPrep(init, limit, step):
+    """
+    check the three for loop control values and step the index back once.
+    integer init and step give an integer loop, anything else a float loop;
+    the limit may stay a float in an integer loop since python compares int
+    and float exactly
+    :return: (index, limit, step)
+    """
+    if type(init) is not int or type(step) is not int:
+        init, ok = convertToFloat(init)
+        if not ok:
+            raise TypeError("'for' initial value must be a number")
+        step, ok = convertToFloat(step)
+        if not ok:
+            raise TypeError("'for' step must be a number")
+    if type(limit) is not int and type(limit) is not float:
+        limit, ok = convertToFloat(limit)
+        if not ok:
+            raise TypeError("'for' limit must be a number")
+    return init - step, limit, step
+
+
+def forprep(vm: LuaVM, inst, pc):
+    """
+    R(A) -= R(A+2); pc += sBx
+    R(A), R(A+1), R(A+2) are hidden from lua code
+    """
+    _, a, sBx, _ = inst
+    stack = vm.stack
+    slots = stack.slots
+    a += stack.base
+    slots[a], slots[a + 1], slots[a + 2] = forPrep(slots[a], slots[a + 1], slots[a + 2])
+    return pc + sBx
+
+
+def forloop(vm: LuaVM, inst, pc):
+    """
+    R(A) += R(A+2); if R(A) <?= R(A+1) then { pc += sBx; R(A+3) = R(A) }
+    """
+    _, a, sBx, _ = inst
+    stack = vm.stack
+    slots = stack.slots
+    a += stack.base
+    step = slots[a + 2]
+    index = slots[a] + step
+    if index <= slots[a + 1] if step > 0 else slots[a + 1] <= index:
+        slots[a] = index
+        slots[a + 3] = index
+        return pc + sBx
+    return pc
+
+
+def tforcall(vm: LuaVM, inst, pc):
+    """
+    R(A+3), ... ,R(A+2+C) := R(A)(R(A+1), R(A+2))
+    the builtin next and ipairs iterator run here without a call when the state is a table:
+    ipairs reads t[i + 1], next resumes the cursor of this loop instead of finding the
+    control key again, a cursor is dropped once the control key is not its last key
+    """
+    _, a, _, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    a += stack.base
+    f, t, control = slots[a:a + 3]
+    if type(f) is LuaClosure and type(t) is LuaTable:
+        pyFunc = f.pyFunc
+        if pyFunc is luaNext:
+            cursors = stack.cursors
+            if cursors is None:
+                cursors = stack.cursors = {}
+            cursor = cursors.get(a)
+            if cursor is None or cursor[0] is not t or cursor[1] is not control:
+                cursor = cursors[a] = [t, control, t.entries(control)]
+            key, value = next(cursor[2], (None, None))
+            if key is None:
+                del cursors[a]
+            else:
+                cursor[1] = key
+        elif pyFunc is ipairsAux and type(control) is int:
+            key = control + 1
+            value = t.get(key)
+            if value is None and t.metatable is not None:
+                value = vm.index(t, key)
+            if value is None:
+                key = None
         else:
-            self._fixStack(a, vm)
-
-    def call(self, vm: LuaVM):
-        a, b, c = self.getAbc()
-        a += 1
-        nArgs = self._pushFuncAndArgs(a, b, vm)
-        vm.Call(nArgs, c - 1)
-        self._popResults(a, c, vm)
-
-    def vararg(self, vm: LuaVM):
-        a, b, _ = self.getAbc()
-        a += 1
-        if b is not 1:
-            vm.LoadVararg(b - 1)
-            self._popResults(a, b, vm)
-
-    def tailCall(self, vm: LuaVM):
-        a, b, _ = self.getAbc()
-        a += 1
-        c = 0
-
-        nArgs = self._pushFuncAndArgs(a, b, vm)
-        vm.Call(nArgs, c - 1)
-        self._popResults(a, c, vm)
-
-    def self(self, vm: LuaVM):
-        a, b, c = self.getAbc()
-        a += 1
-        b += 1
-        vm.Copy(b, a + 1)
-        vm.GetRk(c)
-        vm.GetTable(b)
-        vm.Replace(a)
-
-    def gettabup(self, vm: LuaVM):
-        a, b, c = self.getAbc()
-        a += 1
-        b += 1
-        vm.GetRk(c)
-        vm.GetTable(vm.LuaUpvalueIndex(b))
-        vm.Replace(a)
-
-    def settabup(self, vm: LuaVM):
-        a, b, c = self.getAbc()
-        a += 1
-        vm.GetRk(b)
-        vm.GetRk(c)
-        vm.SetTable(vm.LuaUpvalueIndex(a))
-
-    def getupval(self, vm: LuaVM):
-        a, b, _ = self.getAbc()
-        a += 1
-        b += 1
-        vm.Copy(vm.LuaUpvalueIndex(b), a)
-
-    def setupval(self, vm: LuaVM):
-        a, b, _ = self.getAbc()
-        a += 1
-        b += 1
-        vm.Copy(a,vm.LuaUpvalueIndex(b))
-
-    def execute(self, vm: LuaVM):
-        action = getattr(self, str.lower(opcodes[self.getOpcode()].name))
-        if action is not None:
-            action(vm)
+            pyFunc = None
+        if pyFunc is not None:
+            slots[a + 3] = key
+            if c > 1:
+                slots[a + 4] = value
+                if c > 2:
+                    slots[a + 5:a + 3 + c] = [None] * (c - 2)
+            return pc
+    slots[a + 3:a + 6] = f, t, control
+    vm.callFunction(a + 3, 2, c)
+    return pc
+
+
+def tforloop(vm: LuaVM, inst, pc):
+    """
+    if R(A+1) ~= nil then { R(A) = R(A+1); pc += sBx }
+    """
+    _, a, sBx, _ = inst
+    stack = vm.stack
+    slots = stack.slots
+    a += stack.base
+    value = slots[a + 1]
+    if value is not None:
+        slots[a] = value
+        return pc + sBx
+    return pc
+
+
+def newtable(vm: LuaVM, inst, pc):
+    _, a, b, c = inst
+    stack = vm.stack
+    stack.slots[stack.base + a] = LuaTable(FbToInt(b), FbToInt(c))
+    return pc
+
+
+def gettable(vm: LuaVM, inst, pc):
+    _, a, b, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    slots[base + a] = vm.getTable(slots[base + b], slots[base + c] if c >= 0 else stack.consts[-1 - c])
+    return pc
+
+
+def settable(vm: LuaVM, inst, pc):
+    _, a, b, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    consts = stack.consts
+    vm.setTable(slots[base + a], slots[base + b] if b >= 0 else consts[-1 - b],
+                slots[base + c] if c >= 0 else consts[-1 - c])
+    return pc
+
+
+def setlist(vm: LuaVM, inst, pc):
+    """
+    R(A)[(C-1)*FPF+i] := R(A+i), 1 <= i <= B
+    a zero C is replaced by the following EXTRAARG at decode time,
+    a zero B takes every value up to the top left by a multiple results CALL / VARARG;
+    the run is stored with one LuaTable.putList
+    """
+    _, a, b, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    if b == 0:
+        b = stack.top - a - 1
+        stack.top = vm.RegisterCount()
+    a += stack.base
+    slots[a].putList((c - 1) * LuaTable.LFIELDS_PER_FLUSH + 1, slots[a + 1:a + b + 1])
+    return pc
+
+
+def closure(vm: LuaVM, inst, pc):
+    _, a, bx, _ = inst
+    vm.LoadProto(bx)
+    vm.Replace(a + 1)
+    return pc
+
+
+# calls follow the lua convention: the callee frame starts after R(A) so the
+# arguments are already in place, results are moved down to R(A); a zero B
+# takes the arguments up to the frame top, and a zero C (or B for VARARG)
+# leaves the frame top right after the last result for the next instruction
+
+
+def lreturn(vm: LuaVM, inst, pc):
+    """
+    return R(A), ... ,R(A+B-2)
+    """
+    _, a, b, _ = inst
+    stack = vm.stack
+    stack.retBase = a
+    if b != 0:
+        stack.top = a + b - 1
+    return None
+
+
+def call(vm: LuaVM, inst, pc):
+    """
+    R(A), ... ,R(A+C-2) := R(A)(R(A+1), ... ,R(A+B-1))
+    """
+    _, a, b, c = inst
+    stack = vm.stack
+    nArgs = b - 1 if b != 0 else stack.top - a - 1
+    n = vm.callFunction(stack.base + a, nArgs, c - 1)
+    stack.top = a + n if c == 0 else vm.RegisterCount()
+    return pc
+
+
+def vararg(vm: LuaVM, inst, pc):
+    """
+    R(A), R(A+1), ..., R(A+B-2) = vararg
+    """
+    _, a, b, _ = inst
+    stack = vm.stack
+    varargs = stack.varargs
+    if b == 0:
+        n = len(varargs)
+        stack.top = a + n
+        stack.check(0)
+    else:
+        n = b - 1
+    values = varargs[:n]
+    if len(values) < n:
+        values += [None] * (n - len(values))
+    a += stack.base
+    stack.slots[a:a + n] = values
+    return pc
+
+
+def tailcall(vm: LuaVM, inst, pc):
+    """
+    return R(A)(R(A+1), ... ,R(A+B-1)), run as a call keeping every result for the RETURN that follows
+    """
+    _, a, b, _ = inst
+    stack = vm.stack
+    nArgs = b - 1 if b != 0 else stack.top - a - 1
+    stack.top = a + vm.callFunction(stack.base + a, nArgs, -1)
+    return pc
+
+
+def lself(vm: LuaVM, inst, pc):
+    """
+    R(A+1) := R(B); R(A) := R(B)[RK(C)]
+    """
+    _, a, b, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    t = slots[base + a + 1] = slots[base + b]
+    slots[base + a] = vm.getTable(t, slots[base + c] if c >= 0 else stack.consts[-1 - c])
+    return pc
+
+
+def gettabup(vm: LuaVM, inst, pc):
+    _, a, b, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    slots[base + a] = vm.getTable(stack.closure.upvalues[b],
+                                  slots[base + c] if c >= 0 else stack.consts[-1 - c])
+    return pc
+
+
+def settabup(vm: LuaVM, inst, pc):
+    _, a, b, c = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    consts = stack.consts
+    vm.setTable(stack.closure.upvalues[a], slots[base + b] if b >= 0 else consts[-1 - b],
+                slots[base + c] if c >= 0 else consts[-1 - c])
+    return pc
+
+
+def getupval(vm: LuaVM, inst, pc):
+    _, a, b, _ = inst
+    stack = vm.stack
+    stack.slots[stack.base + a] = stack.closure.upvalues[b]
+    return pc
+
+
+def setupval(vm: LuaVM, inst, pc):
+    _, a, b, _ = inst
+    stack = vm.stack
+    stack.closure.upvalues[b] = stack.slots[stack.base + a]
+    return pc
+
+
+# handler for every opcode, indexed by opcode number
+dispatch = [move, loadk, loadkx, loadbool,
+            loadnil, getupval, gettabup, gettable,
+            settabup, setupval, settable, newtable,
+            lself, add, sub, mul,
+            mod, lpow, div, idiv,
+            band, bor, bxor, shl,
+            shr, unm, bnot, lnot,
+            llen, concat, jmp, eq,
+            lt, le, test, testset,
+            call, tailcall, lreturn, forloop,
+            forprep, tforcall, tforloop, setlist,
+            closure, vararg, extraarg]
+
+
+def compareJump(op):
+    """
+    EQ/LT/LE followed by JMP, also the generic variant a quickened compare ends in
+    (op, A, B, C, jump target, A of JMP)
+    :param op: CompareOp
+    :return: handler
+    """
+    comparator = comparators[op]
+
+    def handler(vm: LuaVM, inst, pc):
+        _, a, b, c, target, ja = inst
+        stack = vm.stack
+        slots = stack.slots
+        base = stack.base
+        x = slots[base + b] if b >= 0 else stack.consts[-1 - b]
+        y = slots[base + c] if c >= 0 else stack.consts[-1 - c]
+        if type(x) is LuaTable or type(y) is LuaTable:
+            result = vm.compare(x, y, op)
         else:
-            raise RuntimeError('not support code')
+            result = comparator(x, y)
+        if result != (a != 0):
+            return pc + 1
+        if ja != 0:
+            vm.CloseUpValues(ja)
+        return target
+
+    return handler
+
+
+# the adaptive compare handlers take the fused layout as well
+eqjmp = eq
+ltjmp = lt
+lejmp = le
+
+
+def testjmp(vm: LuaVM, inst, pc):
+    """
+    TEST followed by JMP
+    (op, A, C, jump target, A of JMP)
+    """
+    _, a, c, target, ja = inst
+    stack = vm.stack
+    value = stack.slots[stack.base + a]
+    if (value is not None and value is not False) != (c != 0):
+        return pc + 1
+    if ja != 0:
+        vm.CloseUpValues(ja)
+    return target
+
+
+def gettabupcall(vm: LuaVM, inst, pc):
+    """
+    GETTABUP followed by CALL, usually a global function call
+    (op, A, B, C, decoded CALL)
+    """
+    _, a, b, c, callInst = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    slots[base + a] = vm.getTable(stack.closure.upvalues[b],
+                                  slots[base + c] if c >= 0 else stack.consts[-1 - c])
+    return call(vm, callInst, pc + 1)
+
+
+def loadkarith(vm: LuaVM, inst, pc):
+    """
+    LOADK followed by a binary arithmetic instruction
+    (op, A, Bx, decoded arithmetic instruction, its handler)
+    """
+    _, a, bx, arithInst, arithHandler = inst
+    stack = vm.stack
+    stack.slots[stack.base + a] = stack.consts[bx]
+    return arithHandler(vm, arithInst, pc + 1)
+
+
+def getglobalcall(vm: LuaVM, inst, pc):
+    """
+    GETGLOBAL followed by CALL
+    (op, A, B, key, cache, decoded CALL)
+    """
+    getglobal(vm, inst, pc)
+    return call(vm, inst[5], pc + 1)
+
+
+dispatch += [eqjmp, ltjmp, lejmp, testjmp,
+             gettabupcall, loadkarith, getglobalcall]
+
+compareJumps = {OPCODE.OP_EQ.value: FUSEDOPCODE.OP_EQJMP.value,
+                OPCODE.OP_LT.value: FUSEDOPCODE.OP_LTJMP.value,
+                OPCODE.OP_LE.value: FUSEDOPCODE.OP_LEJMP.value}
+
+
+def fuseCode(insts: list) -> list:
+    """
+    rewrite common instruction pairs in a decoded code list into one fused
+    instruction at the first pc. the second instruction stays where it is,
+    so a jump that lands on it still runs the plain version; Proto.code is
+    left untouched and getCodeList keeps listing the luac opcodes
+    :param insts: decoded instructions, modified in place
+    :return: insts
+    """
+    for pc in range(len(insts) - 1):
+        inst = insts[pc]
+        op = inst[0]
+        nextInst = insts[pc + 1]
+        nextOp = nextInst[0]
+        if nextOp == OP_JMP:
+            _, ja, sBx, _ = nextInst
+            target = pc + 2 + sBx
+            if op in compareJumps:
+                _, a, b, c = inst
+                insts[pc] = (compareJumps[op], a, b, c, target, ja)
+            elif op == OP_TEST:
+                _, a, _, c = inst
+                insts[pc] = (FUSEDOPCODE.OP_TESTJMP.value, a, c, target, ja)
+        elif op == OP_GETTABUP and nextOp == OP_CALL:
+            insts[pc] = (FUSEDOPCODE.OP_GETTABUPCALL.value,) + inst[1:] + (nextInst,)
+        elif op == OP_GETGLOBAL and nextOp == OP_CALL:
+            insts[pc] = (FUSEDOPCODE.OP_GETGLOBALCALL.value,) + inst[1:] + (nextInst,)
+        elif op == OP_LOADK and OP_ADD <= nextOp <= OP_SHR:
+            _, a, bx, _ = inst
+            insts[pc] = (FUSEDOPCODE.OP_LOADKARITH.value, a, bx, nextInst,
+                         dispatch[genericOps.get(nextOp, nextOp)])
+    return insts
+
+
+def fuseProto(proto):
+    """
+    run fuseCode over a proto and all of its nested protos
+    :param proto: Proto
+    :return:
+    """
+    fuseCode(proto.insts)
+    for p in proto.protos:
+        fuseProto(p)
+
+
+# a field cache is a list [shape, slot] owned by one instruction, it hits when
+# the table the instruction sees has that shape, whose key slot holds the value;
+# UNBOUND is never the shape of a table
+
+
+UNBOUND = object()
+
+
+def bindField(t, key: str, cache: list):
+    """
+    point cache at the slot of key in the shape of t, unbind it when t has no shape holding key
+    """
+    shape = t.shape if type(t) is LuaTable else None
+    if shape is not None and key in shape.index:
+        cache[0] = shape
+        cache[1] = shape.index[key]
+    else:
+        cache[0] = UNBOUND
+
+
+def getfield(vm: LuaVM, inst, pc):
+    """
+    GETTABLE with a constant string key
+    (op, A, B, key, cache)
+    """
+    _, a, b, key, cache = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    t = slots[base + b]
+    if type(t) is LuaTable and t.shape is cache[0]:
+        slots[base + a] = t.values[cache[1]]
+        return pc
+    slots[base + a] = vm.getTable(t, key)
+    bindField(t, key, cache)
+    return pc
+
+
+def setfield(vm: LuaVM, inst, pc):
+    """
+    SETTABLE with a constant string key
+    (op, A, key, C, cache)
+    a non nil value for a key the shape already has replaces the slot, anything
+    else goes through put, which may give the table the next shape
+    """
+    _, a, key, c, cache = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    t = slots[base + a]
+    value = slots[base + c] if c >= 0 else stack.consts[-1 - c]
+    if value is not None and type(t) is LuaTable and t.shape is cache[0]:
+        t.values[cache[1]] = value
+        return pc
+    vm.setTable(t, key, value)
+    bindField(t, key, cache)
+    return pc
+
+
+def selffield(vm: LuaVM, inst, pc):
+    """
+    SELF with a constant string key
+    (op, A, B, key, cache)
+    """
+    _, a, b, key, cache = inst
+    stack = vm.stack
+    slots = stack.slots
+    base = stack.base
+    t = slots[base + a + 1] = slots[base + b]
+    if type(t) is LuaTable and t.shape is cache[0]:
+        slots[base + a] = t.values[cache[1]]
+        return pc
+    slots[base + a] = vm.getTable(t, key)
+    bindField(t, key, cache)
+    return pc
+
+
+# a global cache is a list [env table, cell of the key in env], it is rebound
+# whenever the instruction sees an _ENV that is not the one it was bound to
+
+
+def _bindGlobal(env, key, cache, message):
+    if type(env) is not LuaTable:
+        raise TypeError(message)
+    cache[0] = env
+    cache[1] = env.getCell(key)
+
+
+def getglobal(vm: LuaVM, inst, pc):
+    """
+    GETTABUP on _ENV with a constant string key
+    (op, A, B, key, cache)
+    """
+    _, a, b, key, cache = inst[:5]
+    stack = vm.stack
+    env = stack.closure.upvalues[b]
+    if env is not cache[0]:
+        _bindGlobal(env, key, cache, 'get value from a element not a table')
+    value = cache[1][0]
+    if value is None and env.metatable is not None:
+        value = vm.index(env, key)
+    stack.slots[stack.base + a] = value
+    return pc
+
+
+def setglobal(vm: LuaVM, inst, pc):
+    """
+    SETTABUP on _ENV with a constant string key
+    (op, A, key, C, cache)
+    replacing a non nil global with a non nil value writes the cell and the
+    hash entry directly, anything else goes through setTable whose put updates the cell
+    """
+    _, a, key, c, cache = inst
+    stack = vm.stack
+    env = stack.closure.upvalues[a]
+    value = stack.slots[stack.base + c] if c >= 0 else stack.consts[-1 - c]
+    if env is not cache[0]:
+        _bindGlobal(env, key, cache, 'set value to a element not a table')
+    cell = cache[1]
+    if value is not None and cell[0] is not None:
+        env.replaceField(key, value)
+    else:
+        vm.setTable(env, key, value)
+    return pc
+
+
+dispatch += [getfield, setfield, selffield, getglobal, setglobal]
+
+
+def cacheFields(insts: list, constants: list, upValueNames: list) -> list:
+    """
+    give every GETTABLE / SETTABLE / SELF whose key is a constant string
+    its own inline cache, and bind GETTABUP / SETTABUP on _ENV with a
+    constant string key to global cells; the key constant is stored in the instruction
+    :param insts: decoded instructions, modified in place
+    :param constants: the proto's constants
+    :param upValueNames: the proto's upvalue names, empty when the chunk is stripped
+    :return: insts
+    """
+    for pc, inst in enumerate(insts):
+        op = inst[0]
+        if op == OP_GETTABUP:
+            _, a, b, c = inst
+            if c < 0 and type(constants[-1 - c]) is str and b < len(upValueNames) \
+                    and upValueNames[b] == '_ENV':
+                insts[pc] = (OP_GETGLOBAL, a, b, constants[-1 - c], [UNBOUND, None])
+        elif op == OP_SETTABUP:
+            _, a, b, c = inst
+            if b < 0 and type(constants[-1 - b]) is str and a < len(upValueNames) \
+                    and upValueNames[a] == '_ENV':
+                insts[pc] = (OP_SETGLOBAL, a, constants[-1 - b], c, [UNBOUND, None])
+        elif op == OP_SETTABLE:
+            _, a, b, c = inst
+            if b < 0 and type(constants[-1 - b]) is str:
+                insts[pc] = (OP_SETFIELD, a, constants[-1 - b], c, [UNBOUND, 0])
+        elif op == OP_GETTABLE or op == OP_SELF:
+            _, a, b, c = inst
+            if c < 0 and type(constants[-1 - c]) is str:
+                cachedOp = OP_GETFIELD if op == OP_GETTABLE else OP_SELFFIELD
+                insts[pc] = (cachedOp, a, b, constants[-1 - c], [UNBOUND, 0])
+    return insts
+
+
+numberTypes = frozenset([int, float])
+stringTypes = frozenset([str])
+
+dispatch += [specializedArith(operator.add, int, QUICKENEDOPCODE.OP_ADD_GENERIC.value),
+             specializedArith(operator.add, float, QUICKENEDOPCODE.OP_ADD_GENERIC.value),
+             binaryArith(ARIOPENUM.LUA_OPADD.value),
+             specializedArith(operator.sub, int, QUICKENEDOPCODE.OP_SUB_GENERIC.value),
+             specializedArith(operator.sub, float, QUICKENEDOPCODE.OP_SUB_GENERIC.value),
+             binaryArith(ARIOPENUM.LUA_OPSUB.value),
+             specializedArith(operator.mul, int, QUICKENEDOPCODE.OP_MUL_GENERIC.value),
+             specializedArith(operator.mul, float, QUICKENEDOPCODE.OP_MUL_GENERIC.value),
+             binaryArith(ARIOPENUM.LUA_OPMUL.value),
+             specializedCompare(operator.eq, numberTypes, QUICKENEDOPCODE.OP_EQ_GENERIC.value),
+             specializedCompare(operator.eq, stringTypes, QUICKENEDOPCODE.OP_EQ_GENERIC.value),
+             compareJump(COMOPENUM.LUA_OPEQ.value),
+             specializedCompare(operator.lt, numberTypes, QUICKENEDOPCODE.OP_LT_GENERIC.value),
+             specializedCompare(operator.lt, stringTypes, QUICKENEDOPCODE.OP_LT_GENERIC.value),
+             compareJump(COMOPENUM.LUA_OPLT.value),
+             specializedCompare(operator.le, numberTypes, QUICKENEDOPCODE.OP_LE_GENERIC.value),
+             specializedCompare(operator.le, stringTypes, QUICKENEDOPCODE.OP_LE_GENERIC.value),
+             compareJump(COMOPENUM.LUA_OPLE.value)]
+
+# generic variant of the arithmetic opcodes that quicken, LOADKARITH calls it
+# directly as its inner instruction is not a site of its own
+genericOps = {OPCODE.OP_ADD.value: QUICKENEDOPCODE.OP_ADD_GENERIC.value,
+              OPCODE.OP_SUB.value: QUICKENEDOPCODE.OP_SUB_GENERIC.value,
+              OPCODE.OP_MUL.value: QUICKENEDOPCODE.OP_MUL_GENERIC.value}
@@ -1,36 +1,102 @@
-import collections
+import collections.abc
+import weakref
+from array import array
 
-from lmath import FloatToInteger
-from lvalue import LuaValue, LUATYPE, LuaNil
+from lvalue import LUATYPE, LuaClosure, LuaRope, luatypes
 
 
-class LuaDict(collections.Mapping):
+def isLuaValue(value) -> bool:
+    return type(value) in luatypes or isinstance(value, (LuaTable, LuaClosure, LuaRope))
+
+
+class BoolKey:
+    """
+    dict key standing for a boolean, python hashes True as 1 and False as 0
+    but lua keeps t[true] and t[1] apart
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: bool):
+        self.value = value
+
+
+boolKeys = {True: BoolKey(True), False: BoolKey(False)}
+
+# array typecode of the number type an array part can be stored as
+typeCodes = {int: 'q', float: 'd'}
+
+# metamethod events in lua's TMS order, the arithmetic ones follow ARIOPENUM: add + op is op's event
+tmNames = ['__index', '__newindex', '__gc', '__mode', '__len', '__eq', '__add', '__sub', '__mul', '__mod', '__pow',
+           '__div', '__idiv', '__band', '__bor', '__bxor', '__shl', '__shr', '__unm', '__bnot', '__lt', '__le',
+           '__concat', '__call']
+TM_INDEX, TM_NEWINDEX, TM_LEN, TM_EQ, TM_ADD, TM_LT, TM_LE, TM_CONCAT, TM_CALL = (
+    tmNames.index(name) for name in ('__index', '__newindex', '__len', '__eq', '__add', '__lt', '__le', '__concat',
+                                     '__call'))
+
+
+def normalizeKey(key):
+    """
+    raw hashable form of a key, a table lookup is then a single dict probe:
+    floats with an integer value become that int, booleans their BoolKey and
+    ropes their string; the caller's value is never modified
+    :param key: unboxed value
+    :return: dict key
+    """
+    keyType = type(key)
+    if keyType is float:
+        if key.is_integer():
+            return int(key)
+    elif keyType is bool:
+        return boolKeys[key]
+    elif keyType is LuaRope:
+        return key.flatten()
+    return key
+
+
+def checkKey(key):
+    """
+    a normalized key a table can store
+    """
+    if key is None:
+        raise TypeError('table index is nil')
+    if key != key:
+        raise TypeError('table index is NaN')
+
+
+class LuaDict(collections.abc.MutableMapping):
+    """
+    checked mapping of lua values with the keys of the table hash part
+    """
+    __slots__ = ('map',)
+
     def __init__(self):
         self.map = {}
 
     def __setitem__(self, key, value):
-        if not isinstance(key, LuaValue):
-            raise TypeError('key must be instance of LuaValue')
-        if not isinstance(value, LuaValue):
-            raise TypeError('value must be instance of  LuaValue')
-        if key.typeOf() is LUATYPE.LUA_TSTRING.value:
-            self.map[key.value] = value
-        else:
-            self.map[key] = value
+        if not isLuaValue(key) and key is not None:
+            raise TypeError('key must be a lua value')
+        if not isLuaValue(value):
+            raise TypeError('value must be a lua value')
+        key = normalizeKey(key)
+        checkKey(key)
+        self.map[key] = value
 
     def __getitem__(self, item):
-        if item.typeOf() is LUATYPE.LUA_TSTRING.value:
-            item = item.value
-        return self.map.get(item,LuaNil())
+        return self.map.get(normalizeKey(item))
+
+    def __delitem__(self, key):
+        self.map.pop(normalizeKey(key), None)
 
     def __iter__(self):
-        return iter(self.map)
+        return (key.value if type(key) is BoolKey else key for key in self.map)
 
     def __len__(self):
         return len(self.map)
 
 
-class LuaArray(collections.MutableSequence):
+class LuaArray(collections.abc.MutableSequence):
+    __slots__ = ('arr',)
+
     def __init__(self):
         self.arr = []
 
@@ -53,88 +119,542 @@ class LuaArray(collections.MutableSequence):
 
     @staticmethod
     def assertValue(value):
-        if not isinstance(value, LuaValue):
-            raise TypeError('value must be instance of  LuaValue')
+        if not isLuaValue(value):
+            raise TypeError('value must be a lua value')
+
+
+class Shape:
+    """
+    hidden class of record tables: the string keys of a hash part in the order
+    they were added, tables given the same keys in the same order share one
+    shape and keep their values in a list indexed like keys; the tree of shapes is
+    shared by every state, a shape lives while a table, a field cache or a longer
+    shape refers to it
+    """
+    # keys a shape holds and live shapes one shape leads to before tables go to a dict
+    MAXKEYS = 32
+    MAXTRANSITIONS = 64
+    __slots__ = ('keys', 'index', 'transitions', 'parent', '__weakref__')
+
+    def __init__(self, keys: tuple, parent=None):
+        self.keys = keys
+        # key -> slot in the values list
+        self.index = {key: i for i, key in enumerate(keys)}
+        # key -> weak reference to the shape of these keys followed by key
+        self.transitions = {}
+        # kept alive by its children, so tables adding the same keys again reach the same shapes
+        self.parent = parent
+
+    def add(self, key: str):
+        """
+        :return: shape with key appended, None when a table should rather keep its keys in a dict
+        """
+        ref = self.transitions.get(key)
+        shape = None if ref is None else ref()
+        if shape is None:
+            if len(self.keys) >= self.MAXKEYS:
+                return None
+            if len(self.transitions) >= self.MAXTRANSITIONS:
+                # forget the shapes no table uses anymore before giving up
+                self.transitions = {k: r for k, r in self.transitions.items() if r() is not None}
+                if len(self.transitions) >= self.MAXTRANSITIONS:
+                    return None
+            shape = Shape(self.keys + (key,), self)
+            self.transitions[key] = weakref.ref(shape)
+        return shape
 
 
-class LuaTable(LuaValue):
+emptyShape = Shape(())
+# hash part of a table without non string keys yet, never written: put gives the table its own dict first
+emptyMap = {}
+
+
+class LuaTable:
     LFIELDS_PER_FLUSH = 50
+    # array part sizes are powers of two up to 2 ** MAXABITS
+    MAXABITS = 31
+    MAXINTEGER = (1 << 63) - 1
+    __slots__ = ('type', 'shape', 'values', 'cells', 'arr', 'arrType', 'asize', 'map', 'hashSize', 'border',
+                 'keys', 'metatable', 'flags')
 
     def __init__(self, narr: int, nrec: int):
-        super().__init__(LUATYPE.LUA_TTABLE.value, self)
-        if narr > 0:
-            self.arr = LuaArray()
-        if nrec > 0:
-            self.map = LuaDict()
+        """
+        :param narr: array part size hint, NEWTABLE's B
+        :param nrec: hash part size hint, NEWTABLE's C
+        """
+        self.type = LUATYPE.LUA_TTABLE.value
+        # string keys of the hash part: the value of shape.keys[i] is values[i]; shape is
+        # None once they moved to map, after a string key was removed or shapes ran out
+        self.shape = emptyShape
+        self.values = None
+        # name -> [value] cells handed out by getCell, kept in step by put
+        self.cells = None
+        # array part of asize slots: t[i] lives at arr[i - 1] for 1 <= i <= len(arr), the
+        # slots past len(arr) are nil; arr is a list with None for nil, or while every
+        # value has the same number type arrType an array('q') / array('d')
+        self.arr = []
+        self.arrType = None
+        self.asize = narr
+        # hash part without the keys of shape, keys in their normalizeKey form
+        self.map = emptyMap
+        # keys the hash part holds before a new one triggers rehash, a power of two like lua's node size
+        self.hashSize = self.ceilPowerOfTwo(nrec)
+        # last border len found in the array part, t[#t + 1] = v and t[#t] = nil move it by one
+        self.border = 0
+        # (hash keys, position of each key or None until next is given a hash key) of
+        # the walk in progress, cleared when a walk reaches the end
+        self.keys = None
+        self.metatable = None
+        # bit 1 << event set: this table, used as a metatable, is known to have no handler
+        # for event; cleared whenever a string key is added, see metamethod
+        self.flags = 0
 
-    def get(self, key: LuaValue) -> LuaValue:
+    def get(self, key):
         """
         if key is int or can be convert to int,get value from array
-        :param key:
-        :return:
+        :param key: unboxed value
+        :return: unboxed value, None when absent
         """
-        key = self.floatToInteger(key)
-        if type(key.value) is int and (1 <= key.value <= len(self.arr)):
-            return self.arr[key.value - 1]
+        keyType = type(key)
+        if keyType is not str and keyType is not int:
+            # a rope becomes a str, which the shape may hold like put stored it
+            key = normalizeKey(key)
+            keyType = type(key)
+            if keyType is not int and keyType is not str:
+                return self.map.get(key)
+        if keyType is str:
+            shape = self.shape
+            if shape is None:
+                return self.map.get(key)
+            i = shape.index.get(key)
+            return None if i is None else self.values[i]
+        arr = self.arr
+        if 0 < key <= len(arr):
+            return arr[key - 1]
         return self.map.get(key)
 
     def put(self, key, value):
-        key = self.floatToInteger(key)
-        if type(key.value) is int and key.value >= 1:
-            if not hasattr(self,'arr'):
-                self.arr = LuaArray()
-            if key.value <= len(self.arr):
-                self.arr[key.value - 1] = value
-                if key.value == len(self.arr) and value.value is None:
-                    self.shrinkArray()
+        keyType = type(key)
+        if keyType is not str and keyType is not int:
+            key = normalizeKey(key)
+            checkKey(key)
+            keyType = type(key)
+        if keyType is str:
+            shape = self.shape
+            if shape is not None:
+                i = shape.index.get(key)
+                if i is not None:
+                    if value is not None:
+                        self.values[i] = value
+                        return
+                elif value is None:
+                    return
+                else:
+                    self.flags = 0
+                    shape = shape.add(key)
+                    if shape is not None:
+                        self.shape = shape
+                        if self.values is None:
+                            self.values = [value]
+                        else:
+                            self.values.append(value)
+                        return
+                self.toDict()
+            elif self.cells is not None and key in self.cells:
+                self.cells[key][0] = value
+            self.flags = 0
+        elif keyType is int and 0 < key <= self.asize:
+            arrType = self.arrType
+            if arrType is None or type(value) is arrType:
+                arr = self.arr
+                n = len(arr)
+                # OverflowError: an int beyond 64 bits for an array('q')
+                if key <= n:
+                    try:
+                        arr[key - 1] = value
+                        return
+                    except OverflowError:
+                        pass
+                elif key == n + 1 and n and value is not None:
+                    try:
+                        arr.append(value)
+                        return
+                    except OverflowError:
+                        pass
+            self.putArraySlow(key, value)
+            return
+        items = self.map
+        if value is None:
+            items.pop(key, None)
+            return
+        if items is emptyMap:
+            items = self.map = {}
+        items[key] = value
+        if len(items) > self.hashSize:
+            self.rehash()
+
+    def putArraySlow(self, key: int, value):
+        """
+        store in the array part that the fast path in put cannot do in place: a nil at
+        the end, the first value, a value of another type for a typed array, a key
+        past len(arr) + 1
+        """
+        arr = self.arr
+        n = len(arr)
+        if value is None:
+            if key == n:
+                arr.pop()
                 return
-            if key.value == len(self.arr) + 1:
-                if hasattr(self, 'map'):
-                    del self.map[key]
-                if value.value is not None:
-                    self.arr.append(value)
-                    self.expandArray()
+            if key > n:
                 return
-        if value.value is not None:
-            if not hasattr(self, 'map'):
-                self.map = LuaDict()
-            self.map[key] = value
-        else:
-            del self.map[key]
+        elif n == 0 and key == 1 and type(value) in typeCodes:
+            # the first value of an empty array part decides its type
+            try:
+                self.arr = array(typeCodes[type(value)], [value])
+                self.arrType = type(value)
+                return
+            except OverflowError:
+                pass
+        if self.arrType is not None:
+            self.arr = arr = arr.tolist()
+            self.arrType = None
+        if key > n:
+            arr.extend([None] * (key - n))
+        arr[key - 1] = value
 
-    def floatToInteger(self, key):
+    def putList(self, first: int, values: list):
         """
-        if key is float,try convert to int
-        :param key:
-        :return:
+        t[first], t[first + 1], ... = values in one go, the store of SETLIST; like lua
+        the array part first grows to hold the whole run
+        :param first: key of values[0], positive
+        :param values: unboxed values, None for nil
+        """
+        n = len(values)
+        if n == 0:
+            return
+        last = first + n - 1
+        if last > self.asize:
+            self.resize(last, self.hashSize)
+        arr = self.arr
+        size = len(arr)
+        arrType = self.arrType
+        if first == size + 1 and None not in values:
+            if size == 0:
+                self.arr, self.arrType = self.typedArray(values)
+                return
+            if arrType is None:
+                arr.extend(values)
+                return
+            if set(map(type, values)) == {arrType}:
+                try:
+                    arr.extend(array(arr.typecode, values))
+                    return
+                except OverflowError:
+                    pass
+        if arrType is not None:
+            self.arr = arr = arr.tolist()
+            self.arrType = None
+        if first > size + 1:
+            arr.extend([None] * (first - size - 1))
+        arr[first - 1:last] = values
+        while arr and arr[-1] is None:
+            arr.pop()
+
+    def next(self, key):
+        """
+        lua's next
+        :param key: unboxed value, None for the first entry
+        :return: (key, value) of the entry after key, (None, None) after the last one
         """
-        if key.typeOf() is LUATYPE.LUA_TNUMBER.value:
-            if type(key.value) is float:
-                keytoint, convert = FloatToInteger(key.value)
-                if convert:
-                    key.value = keytoint
-                    return key
-        return key
+        return next(self.entries(key), (None, None))
 
-    def shrinkArray(self):
-        for i in range(len(self.arr) - 1, -1, -1):
-            if self.arr[i].value is None:
-                self.arr.pop()
+    def entries(self, key=None):
+        """
+        generator of the (key, value) pairs after key in next order, the array part
+        by index then the hash part; it is the cursor of a generic for, the array part
+        is read as it is now and the hash part from a list of its keys, so clearing
+        fields during the walk is fine and a key added meanwhile may be missed, which
+        lua leaves undefined as well
+        :param key: unboxed value, None to start at the first entry
+        """
+        i = 0
+        keys = None
+        if key is not None:
+            key = normalizeKey(key)
+            if type(key) is int and 0 < key <= self.asize:
+                i = key
+            else:
+                j = self.keyPosition(key) + 1
+                keys = self.keys[0]
+        if keys is None:
+            # the array part may switch to a list under us, index self.arr afresh
+            while i < len(self.arr):
+                value = self.arr[i]
+                i += 1
+                if value is not None:
+                    yield i, value
+            keys = self.hashKeys()
+            self.keys = keys, None
+            j = 0
+        # the string keys may move from the shape to map under us, get finds them in either
+        get = self.get
+        while j < len(keys):
+            key = keys[j]
+            j += 1
+            value = get(key)
+            if value is not None:
+                yield key.value if type(key) is BoolKey else key, value
+        self.keys = None
+
+    def keyPosition(self, key) -> int:
+        """
+        :param key: normalized key of the hash part
+        :return: index of key in self.keys[0]
+        """
+        if self.keys is not None:
+            keys, positions = self.keys
+            if positions is None:
+                positions = {key: i for i, key in enumerate(keys)}
+                self.keys = keys, positions
+            position = positions.get(key)
+            if position is not None:
+                return position
+        keys = self.hashKeys()
+        positions = {key: i for i, key in enumerate(keys)}
+        if key not in positions:
+            raise KeyError("invalid key to 'next'")
+        self.keys = keys, positions
+        return positions[key]
+
+    def hashKeys(self) -> list:
+        """
+        keys of the hash part, those of the shape first
+        """
+        if self.shape is None:
+            return list(self.map)
+        return list(self.shape.keys) + list(self.map)
+
+    def toDict(self):
+        """
+        leave shape mode: move the string keys to map, in shape order ahead of the other keys
+        """
+        items = dict(zip(self.shape.keys, self.values)) if self.values else {}
+        items.update(self.map)
+        self.map = items
+        self.shape = None
+        self.values = None
 
-    def expandArray(self):
+    def replaceField(self, name: str, value):
         """
-        move item in map to arr
+        overwrite a string key already stored in map with a non nil value,
+        the caller (a global inline cache) has checked the key is there
+        :param name: python str of the key
+        :param value:
         :return:
         """
-        idx = len(self.arr) + 1
-        if hasattr(self, 'map'):
-            for i in self.map.keys():
-                if int(i.value) is idx:
-                    self.arr.append(self.map[i])
-                    del self.map[i]
-                    idx += 1
-                else:
-                    break
+        self.map[name] = value
+        if self.cells is not None and name in self.cells:
+            self.cells[name][0] = value
+
+    def getCell(self, key: str) -> list:
+        """
+        stable cell of a string key, a one item list holding the current value;
+        GETTABUP / SETTABUP on _ENV bind to it so a global access is a cell access;
+        a table with cells keeps its string keys in map, where put keeps the cells in step
+        :param key: str
+        :return: [value]
+        """
+        if self.cells is None:
+            if self.shape is not None:
+                self.toDict()
+            self.cells = {}
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = [self.get(key)]
+        return cell
+
+    @staticmethod
+    def ceilPowerOfTwo(n: int) -> int:
+        return 0 if n <= 0 else 1 << (n - 1).bit_length()
+
+    def rehash(self):
+        """
+        the hash part is full: count the positive integer keys by power of two slices
+        and give the array part the largest size n with more than n / 2 of 1..n in
+        use (lua's computesizes), the other keys size the hash part
+        """
+        nums = [0] * (self.MAXABITS + 1)
+        arr = self.arr
+        totalUse = len(arr)
+        if self.arrType is not None or None not in arr:
+            # keys 1..len(arr) all present: count the slices without walking them
+            k = 0
+            low = 1
+            while low <= totalUse:
+                nums[k] = min(1 << k, totalUse) - low + 1
+                low = (1 << k) + 1
+                k += 1
+        else:
+            totalUse = 0
+            for i, value in enumerate(arr):
+                if value is not None:
+                    # key i + 1 falls in the slice (2 ** (k - 1), 2 ** k] with k = i.bit_length()
+                    nums[i.bit_length()] += 1
+                    totalUse += 1
+        intKeys = totalUse
+        items = self.map
+        for key in [key for key in items if type(key) is int and key > 0]:
+            k = (key - 1).bit_length()
+            if k <= self.MAXABITS:
+                nums[k] += 1
+                intKeys += 1
+        totalUse += len(items)
+        arraySize, arrayUse = self.computeSizes(nums, intKeys)
+        self.resize(arraySize, self.ceilPowerOfTwo(totalUse - arrayUse))
+
+    @staticmethod
+    def computeSizes(nums: list, intKeys: int) -> (int, int):
+        """
+        :param nums: nums[k] is the number of integer keys in (2 ** (k - 1), 2 ** k]
+        :param intKeys: number of integer keys that may go to the array part
+        :return: optimal array size, number of keys that will live in it
+        """
+        a = 0
+        arrayUse = 0
+        optimal = 0
+        k = 0
+        twoToK = 1
+        while intKeys > twoToK // 2:
+            if nums[k] > 0:
+                a += nums[k]
+                if a > twoToK // 2:
+                    optimal = twoToK
+                    arrayUse = a
+            k += 1
+            twoToK *= 2
+        return optimal, arrayUse
+
+    def resize(self, arraySize: int, hashSize: int):
+        """
+        move the keys between the parts for an array part of arraySize slots
+        """
+        arr = self.arr
+        items = self.map
+        oldSize = self.asize
+        if arraySize > oldSize:
+            moved = [items.pop(key, None) for key in range(oldSize + 1, arraySize + 1)]
+            while moved and moved[-1] is None:
+                moved.pop()
+            arrType = self.arrType
+            if len(arr) == oldSize and arrType is not None and all(type(value) is arrType for value in moved):
+                # a full typed array grows by values of its type, the usual t[#t + 1] = v
+                try:
+                    arr.extend(array(arr.typecode, moved))
+                    self.asize = arraySize
+                    self.hashSize = hashSize
+                    return
+                except OverflowError:
+                    pass
+            values = list(arr)
+            values.extend([None] * (oldSize - len(arr)))
+            values.extend(moved)
+        else:
+            for i in range(arraySize, len(arr)):
+                if arr[i] is not None:
+                    items[i + 1] = arr[i]
+            values = list(arr[:arraySize])
+        while values and values[-1] is None:
+            values.pop()
+        self.arr, self.arrType = self.typedArray(values)
+        self.asize = arraySize
+        self.hashSize = hashSize
+
+    @staticmethod
+    def typedArray(values: list):
+        """
+        :param values: array part without trailing nils
+        :return: array part, its number type or None for a list
+        """
+        if values:
+            valueType = type(values[0])
+            if valueType in typeCodes and set(map(type, values)) == {valueType}:
+                try:
+                    return array(typeCodes[valueType], values), valueType
+                except OverflowError:
+                    pass
+        return values, None
 
     def len(self) -> int:
-        return len(self.arr)
+        """
+        a border of the table: t[n] is not nil and t[n + 1] is nil
+        """
+        arr = self.arr
+        j = len(arr)
+        if j < self.asize and (j == 0 or arr[j - 1] is not None):
+            # t[j + 1] is a nil slot of the array part
+            return j
+        if j > 0 and arr[j - 1] is None:
+            n = self.border
+            if n < j:
+                if n == 0 or arr[n - 1] is not None:
+                    if arr[n] is None:
+                        return n
+                    if arr[n + 1] is None:
+                        self.border = n + 1
+                        return n + 1
+                elif n == 1 or arr[n - 2] is not None:
+                    self.border = n - 1
+                    return n - 1
+            # t[j] is nil: binary search the array part for a border below it
+            i = 0
+            while j - i > 1:
+                m = (i + j) // 2
+                if arr[m - 1] is None:
+                    j = m
+                else:
+                    i = m
+            self.border = i
+            return i
+        return self.hashSearch(j)
+
+    def hashSearch(self, j: int) -> int:
+        """
+        lua's unbound search for a border past a full array part: double j until
+        t[j] is nil, then binary search between the last non nil key and it
+        :param j: the array part size, t[j] is not nil unless j is 0
+        """
+        get = self.map.get
+        i = j
+        j += 1
+        while get(j) is not None:
+            i = j
+            if j > self.MAXINTEGER // 2:
+                # no nil below the overflow, find a border the slow way like lua does
+                i = 1
+                while self.get(i) is not None:
+                    i += 1
+                return i - 1
+            j *= 2
+        while j - i > 1:
+            m = (i + j) // 2
+            if get(m) is None:
+                j = m
+            else:
+                i = m
+        return i
+
+
+def metamethod(mt, event: int):
+    """
+    handler for event in metatable mt, lua's fasttm: a handler found missing sets
+    its bit in mt.flags, looking it up again is then one test until mt gets a new key
+    :param mt: LuaTable or None
+    :param event: index in tmNames
+    :return: handler, None when there is none
+    """
+    if mt is None or mt.flags & (1 << event):
+        return None
+    handler = mt.get(tmNames[event])
+    if handler is None:
+        mt.flags |= 1 << event
+    return handler
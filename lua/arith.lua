@@ -0,0 +1,6 @@
+local a, b = 7, 2
+local s = 0
+for i = 1, 3 do
+    s = s + a * i - b // 1
+end
+print(s, a + b, a - b, a * b, a / b, a // b, a % b, a ^ b, -a, a & 3, #"four", not nil, a < b, a <= 7, a == 7.0)
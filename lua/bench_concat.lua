@@ -0,0 +1,7 @@
+local s = ""
+for i = 1, 65536 do
+    s = s .. "0123456789abcdef"
+end
+local seen = {}
+seen[s] = true
+print(#s, seen[s])
@@ -0,0 +1,25 @@
+local t = {}
+for i = 1, 1000 do
+    t[i] = i
+    t["k" .. i] = i
+end
+local function walk(t)
+    local k, v = nil, nil
+    return function()
+        k, v = next(t, k)
+        return k, v
+    end
+end
+local a, b, c = 0, 0, 0
+for _ = 1, 10 do
+    for _, v in pairs(t) do
+        a = a + v
+    end
+    for _, v in ipairs(t) do
+        b = b + v
+    end
+    for _, v in walk(t) do
+        c = c + v
+    end
+end
+print(a, b, c)
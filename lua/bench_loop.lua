@@ -0,0 +1,9 @@
+local sum = 0
+for i = 1, 20000 do
+    if i % 3 == 0 then
+        sum = sum + i * 2
+    elseif i % 3 == 1 then
+        sum = sum - i
+    end
+end
+print(sum)
@@ -0,0 +1,21 @@
+local Point = {}
+Point.__index = Point
+Point.__add = function(a, b) return setmetatable({x = a.x + b.x, y = a.y + b.y}, Point) end
+
+function Point:norm()
+    return self.x * self.x + self.y * self.y
+end
+
+local points = {}
+for i = 1, 1000 do
+    points[i] = setmetatable({x = i, y = i * 2}, Point)
+end
+local sum, total = 0, setmetatable({x = 0, y = 0}, Point)
+for _ = 1, 5 do
+    for i = 1, #points do
+        local p = points[i]
+        sum = sum + p:norm() + (p.z or 0)
+        total = total + p
+    end
+end
+print(sum, total.x, total.y)
@@ -0,0 +1,13 @@
+local points = {}
+for i = 1, 1000 do
+    points[i] = {x = i, y = i * 2, name = "p"}
+end
+local sum = 0
+for _ = 1, 20 do
+    for i = 1, #points do
+        local p = points[i]
+        sum = sum + p.x + p.y
+        p.x = p.x + 1
+    end
+end
+print(sum)
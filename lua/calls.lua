@@ -0,0 +1,24 @@
+function fib(n)
+    if n < 2 then
+        return n
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+local function sum(...)
+    local a, b, c = ...
+    return a + b + c
+end
+local function three()
+    return 1, 2, 3
+end
+local function count(...)
+    local t = { ... }
+    return #t
+end
+function tail(n, acc)
+    if n == 0 then
+        return acc
+    end
+    return tail(n - 1, acc + n)
+end
+print(fib(15), sum(three()), count(three()), count(1, three()), tail(100, 0), three())
@@ -0,0 +1,7 @@
+local name, count, ratio, big = "row", 3, 0.1 + 0.2, 2 ^ 53
+local line = name .. ":" .. count .. "|" .. ratio .. "|" .. big .. "|" .. 1.5 .. "|" .. -0.0 .. "|" .. 1e100
+local pieces = ""
+for i = 1, 10 do
+    pieces = pieces .. i .. ","
+end
+print(line, pieces, #(name .. name .. name .. name .. name .. name .. name .. name))
@@ -0,0 +1,4 @@
+local seven, two, three = 7, 2, 3
+local half, zero = 5.5, 0
+print(seven // two, -seven // two, 7.0 // two, -seven % three, seven % -three, half % -two,
+      two ^ 10, 1 / zero, -1 / zero, 1.0 // zero, "10" + 1, 3 | 1.0)
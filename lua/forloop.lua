@@ -0,0 +1,7 @@
+local n, f, d = 0, 0, 0
+local last, lastf
+for i = 10, 1, -3 do n = n + i end
+for x = 0.5, 2, 0.5 do f = f + x; lastf = x end
+for j = 1, 3.5 do d = d + j; last = j end
+for k = 1, 0 do d = d + 100 end
+print(n, f, d, "" .. last, "" .. lastf)
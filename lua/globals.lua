@@ -0,0 +1,20 @@
+count = 0
+for i = 1, 5 do
+    count = count + i
+end
+local p = print
+local first = count
+local g = _ENV
+_ENV = { count = 100 }
+for i = 1, 2 do
+    count = count + 1
+end
+local second = count
+_ENV = g
+count = count * 2
+local seen = 0
+for i = 1, 3 do
+    seen = seen + count
+    g.count = count + 1
+end
+p(first, second, count, seen)
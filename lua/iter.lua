@@ -0,0 +1,52 @@
+local t = {10, 20, 30, nil, 50, x = 1, y = 2, [true] = 3, [2.5] = 4}
+local n, keys, values = 0, 0, 0
+for k, v in pairs(t) do
+    n = n + 1
+    if k ~= "x" and k ~= "y" and k ~= true then
+        keys = keys + k
+    end
+    values = values + v
+end
+print(n, keys, values)
+
+local sum, last = 0, 0
+for i, v in ipairs(t) do
+    sum = sum + v
+    last = i
+end
+print(sum, last)
+
+local k, v = next(t)
+print(k, v, next({}))
+
+for key in pairs(t) do
+    t[key] = nil
+end
+print(next(t))
+
+local floats = {}
+for i = 1, 100 do
+    floats[i] = i / 2
+end
+local total = 0
+for _, x in ipairs(floats) do
+    for _, y in pairs({x, x}) do
+        total = total + y
+    end
+end
+print(total)
+
+local function range(limit, i)
+    if i < limit then
+        return i + 1
+    end
+end
+local count = 0
+for i in range, 5, 0 do
+    count = count + i
+end
+local seen = 0
+for key, value in next, {a = 1, b = 2, c = 3} do
+    seen = seen + value
+end
+print(count, seen)
@@ -0,0 +1,77 @@
+local Vector = {}
+Vector.__index = Vector
+
+function Vector.new(x, y)
+    return setmetatable({x = x, y = y}, Vector)
+end
+
+function Vector:dot(other)
+    return self.x * other.x + self.y * other.y
+end
+
+Vector.__add = function(a, b)
+    if getmetatable(b) ~= Vector then
+        return Vector.new(a.x + b, a.y + b)
+    end
+    if getmetatable(a) ~= Vector then
+        return Vector.new(a + b.x, a + b.y)
+    end
+    return Vector.new(a.x + b.x, a.y + b.y)
+end
+Vector.__unm = function(a) return Vector.new(-a.x, -a.y) end
+Vector.__eq = function(a, b) return a.x == b.x and a.y == b.y end
+Vector.__lt = function(a, b) return a:dot(a) < b:dot(b) end
+Vector.__len = function(a) return a:dot(a) end
+Vector.__concat = function(a, b)
+    local left = getmetatable(a) == Vector and "v" or a
+    local right = getmetatable(b) == Vector and "v" or b
+    return left .. right
+end
+Vector.__call = function(self, k) return self.x * k end
+
+local a, b = Vector.new(1, 2), Vector.new(3, 4)
+local c = a + b
+print(c.x, c.y, (a + 1).y, (1 + a).x, (-a).x, a:dot(b))
+print(a == Vector.new(1, 2), a ~= b, a < b, b <= a, #b, a(10))
+print(a .. "!" .. 1, "<" .. b)
+
+-- __index / __newindex functions, raw access around them
+local log = {}
+local proxy = setmetatable({}, {
+    __index = function(t, k) return k .. "?" end,
+    __newindex = function(t, k, v) rawset(t, k, v * 2); log[#log + 1] = k end,
+})
+proxy.a = 5
+proxy.a = 6
+print(proxy.a, proxy.b, rawget(proxy, "b"), #log, rawlen({1, 2}), rawequal(a, Vector.new(1, 2)))
+
+-- a chain of __index tables
+local base = {depth = 0}
+local top = base
+for i = 1, 50 do
+    top = setmetatable({}, {__index = top})
+end
+print(top.depth, top.missing)
+
+-- a metatable gains __index after lookups found none
+local mt = {}
+local t = setmetatable({}, mt)
+local misses = 0
+for i = 1, 3 do
+    if t.field == nil then misses = misses + 1 end
+end
+mt.__index = {field = "late"}
+print(misses, t.field)
+
+-- globals and ipairs through __index
+setmetatable(_ENV, {__index = function(_, name) return name .. "!" end})
+print(undefinedGlobal)
+setmetatable(_ENV, nil)
+local seq = setmetatable({1, 2}, {__index = function(_, i) if i <= 4 then return i * 10 end end})
+local total = 0
+for _, v in ipairs(seq) do total = total + v end
+print(total)
+
+-- protected metatables
+local locked = setmetatable({}, {__metatable = "locked"})
+print(getmetatable(locked), getmetatable({}))
@@ -0,0 +1,14 @@
+local Point = {}
+Point.x = 1
+Point.y = 2
+function Point.len2(p)
+    return p.x * p.x + p.y * p.y
+end
+local total = 0
+for i = 1, 10 do
+    total = total + Point:len2()
+    if i == 5 then
+        Point.x = 3
+    end
+end
+print(total, Point.x)
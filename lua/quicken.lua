@@ -0,0 +1,10 @@
+local function add(a, b)
+    return a + b
+end
+local function less(a, b)
+    return a < b
+end
+local function mul(a, b)
+    return a * b
+end
+print(add(1, 2), add(1.5, 2.25), add(2, 3), less(1, 2), less("a", "b"), less(2, 1), mul(3, 4), mul(5, 6))
@@ -0,0 +1,10 @@
+local s = ""
+for i = 1, 25 do
+    s = s .. "ab"
+end
+local k = "ababababababababababababababababababababababababab"
+local t = {}
+t[s] = 1
+local copy = s
+s = s .. "!"
+print(#s, t[k], copy == k, s == k, copy < s, s .. 1)
@@ -0,0 +1,20 @@
+local function three()
+    return 7, 8, 9
+end
+local function pack(...)
+    return {...}
+end
+local big = {
+    1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20,
+    21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40,
+    41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60,
+    0.5, "s", three()
+}
+local sum = 0
+for i = 1, 60 do
+    sum = sum + big[i]
+end
+local holes = {1, nil, 3, nil}
+local mixed = {three(), three()}
+local packed = pack(1, 2, nil, 4)
+print(#big, sum, big[61], big[62], big[65], holes[3], holes[4], #mixed, mixed[4], packed[4])
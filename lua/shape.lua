@@ -0,0 +1,19 @@
+local function getx(p)
+    return p.x
+end
+local function setx(p, v)
+    p.x = v
+end
+local a = {x = 1, y = 2}
+local b = {y = 3, x = 4}
+local c = {x = 5, y = 6}
+c.y = nil
+local sum = 0
+for _, p in ipairs({a, b, c, a, b, c}) do
+    setx(p, getx(p) + 1)
+    sum = sum + getx(p)
+end
+local d = {x = 7}
+setx(d, nil)
+d.z = 8
+print(sum, a.x, b.x, c.x, d.x, d.z, b.y)
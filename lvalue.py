@@ -1,6 +1,6 @@
 from enum import Enum
 
-from lmath import FloatToInteger
+from lmath import FloatToInteger, arithOperators
 
 luatypelist = [(j, i) for i, j in enumerate(['LUA_TNONE', 'LUA_TNIL', 'LUA_TBOOLEAN', 'LUA_TLIGHTUSERDATA',
                                              'LUA_TNUMBER', 'LUA_TSTRING', 'LUA_TTABLE', 'LUA_TFUNCTION',
@@ -14,6 +14,10 @@ class Proto:
         self.source, self.lineDef, self.lastLineDef, self.numParms, self.isVararg \
             , self.maxStackSize, self.code, self.constants, self.upvalues, self.protos, self.lineinfo \
             , self.locVars, self.upValueNames = args
+        # decoded code, filled by the loader
+        self.insts = None
+        # python function built by ljit, False when the proto cannot be translated
+        self.compiled = None
 
     def getCodeList(self):
         # 0x{:08x}
@@ -55,7 +59,151 @@ class Proto:
            ) + self.getCodeList() + self.getConstants() + self.getLocals() + self.getUpvalues()
 
 
+# values live unboxed in registers, tables and constants: nil is None, booleans
+# are bool, numbers int / float and strings str; only tables and closures are
+# objects, they carry their LUATYPE in a type attribute
+luatypes = {type(None): LUATYPE.LUA_TNIL.value, bool: LUATYPE.LUA_TBOOLEAN.value, int: LUATYPE.LUA_TNUMBER.value,
+            float: LUATYPE.LUA_TNUMBER.value, str: LUATYPE.LUA_TSTRING.value}
+
+
+def typeOf(value) -> int:
+    """
+    :param value: unboxed lua value
+    :return: LUATYPE value
+    """
+    t = luatypes.get(type(value))
+    return t if t is not None else value.type
+
+
+def toBoolean(value) -> bool:
+    """
+    only nil and false are false
+    """
+    return value is not None and value is not False
+
+
+def numberToString(value) -> str:
+    """
+    lua's formatting of a number: integers in full, floats with %.14g and a
+    trailing .0 when that reads like an integer
+    """
+    if type(value) is int:
+        return str(value)
+    text = '%.14g' % value
+    if text.lstrip('-').isdigit():
+        text += '.0'
+    return text
+
+
+def convertToFloat(value) -> (float, bool):
+    typeOfValue = type(value)
+    if typeOfValue is float:
+        return value, True
+    elif typeOfValue is int:
+        return float(value), True
+    elif typeOfValue is str:
+        try:
+            return float(value), True
+        except ValueError:
+            return 0, False
+    elif typeOfValue is LuaRope:
+        return convertToFloat(value.flatten())
+    else:
+        return 0, False
+
+
+def convertToInteger(value) -> (int, bool):
+    typeOfValue = type(value)
+    if typeOfValue is int:
+        return value, True
+    elif typeOfValue is float:
+        return FloatToInteger(value)
+    elif typeOfValue is str:
+        try:
+            return int(value), True
+        except ValueError:
+            try:
+                return FloatToInteger(float(value))
+            except ValueError:
+                return 0, False
+    elif typeOfValue is LuaRope:
+        return convertToInteger(value.flatten())
+    else:
+        return 0, False
+
+
+numberTypes = (int, float)
+
+
+def toExactInteger(value) -> int:
+    """
+    operand of a bitwise operator, a float must have an exact integer value
+    """
+    if type(value) is int:
+        return value
+    if not value.is_integer():
+        raise ArithmeticError('number has no integer representation')
+    return int(value)
+
+
+def toArithOperand(value):
+    """
+    slow path of arithmetic: strings are converted to floats, as lua 5.3 does,
+    a bitwise operator then takes their exact integer value
+    """
+    if type(value) is str or type(value) is LuaRope:
+        number, ok = convertToFloat(value)
+        if ok:
+            return number
+    return value
+
+
+def arithErrorMessage(value) -> str:
+    return 'attempt to perform arithmetic on a {} value'.format(LUATYPE(typeOf(value)).name[6:].lower())
+
+
+def buildArithMatrix(intOp, floatOp) -> dict:
+    """
+    handlers of one binary operator keyed by the pair of operand types, int / int
+    and float / float call the operator directly, mixed pairs convert first;
+    pairs that are missing, strings included, take the slow path in LuaValue.arith
+    :param intOp: integer operator, None when the result is always a float
+    :param floatOp: float operator, None for bitwise operators
+    :return: {(type(a), type(b)): handler(a, b)}
+    """
+    if floatOp is None:
+        def mixed(a, b):
+            return intOp(toExactInteger(a), toExactInteger(b))
+
+        return {(int, int): intOp, (int, float): mixed, (float, int): mixed, (float, float): mixed}
+
+    def mixed(a, b):
+        return floatOp(float(a), float(b))
+
+    return {(int, int): intOp if intOp is not None else mixed, (int, float): mixed, (float, int): mixed,
+            (float, float): floatOp}
+
+
+def buildUnaryMatrix(intOp, floatOp) -> dict:
+    """
+    handlers of one unary operator keyed by the operand type
+    """
+    if floatOp is None:
+        return {int: intOp, float: lambda b: intOp(toExactInteger(b))}
+    return {int: intOp, float: floatOp}
+
+
+# indexed by ARIOPENUM value like arithOperators, the last two, UNM and BNOT, are unary
+arithMatrices = [buildArithMatrix(*ops) for ops in arithOperators[:-2]] + \
+                [buildUnaryMatrix(*ops) for ops in arithOperators[-2:]]
+
+
 class LuaValue:
+    """
+    boxed value, only used at the LuaState API boundary, see unbox
+    """
+    __slots__ = ('type', 'value')
+
     def __init__(self, *args):
         self.type, self.value = args
 
@@ -63,89 +211,72 @@ class LuaValue:
         return self.type
 
     def convertToFloat(self):
-        typeOfValue = type(self.value)
-        if typeOfValue is float:
-            return self.value, True
-        elif typeOfValue is int or typeOfValue is str:
-            return float(self.value), True
-        else:
-            return 0, False
+        return convertToFloat(self.value)
 
     def convertToInteger(self):
-        typeOfValue = type(self.value)
-        if typeOfValue is int:
-            return self.value, True
-        elif typeOfValue is float:
-            return FloatToInteger(self.value)
-        elif typeOfValue is str:
-            try:
-                return int(self.value), True
-            except ValueError:
-                return FloatToInteger(float(self.value))
-        else:
-            return 0, False
+        return convertToInteger(self.value)
 
     @staticmethod
-    def arith(a, b, op):
-        if op[1] is None:
-            if a is not None:
-                x, aok = a.convertToInteger()
-                if aok:
-                    y, bok = b.convertToInteger()
-                    if bok:
-                        return LuaNumber(op[0](x, y))
-            else:
-                y, bok = b.convertToInteger()
-                if bok:
-                    return LuaNumber(op[0](y))
-        else:
-            if op[0] is not None:
-                try:
-                    return LuaNumber(op[0](int(a.value), int(b.value)))
-                except ValueError:
-                    pass
-            x, aok = a.convertToFloat()
-            if aok:
-                y, bok = b.convertToFloat()
-                if bok:
-                    return LuaNumber(op[1](x, y))
-        return LuaNil()
+    def arith(a, b, matrix: dict):
+        """
+        :param a: unboxed value
+        :param b: unboxed value
+        :param matrix: arithMatrices entry of the operator
+        :return: result
+        """
+        handler = matrix.get((type(a), type(b)))
+        if handler is None:
+            a = toArithOperand(a)
+            b = toArithOperand(b)
+            handler = matrix.get((type(a), type(b)))
+            if handler is None:
+                raise ArithmeticError(arithErrorMessage(b if type(a) in numberTypes else a))
+        return handler(a, b)
+
+    @staticmethod
+    def unaryArith(b, matrix: dict):
+        """
+        :param b: unboxed value
+        :param matrix: arithMatrices entry of the operator
+        :return: result
+        """
+        handler = matrix.get(type(b))
+        if handler is None:
+            b = toArithOperand(b)
+            handler = matrix.get(type(b))
+            if handler is None:
+                raise ArithmeticError(arithErrorMessage(b))
+        return handler(b)
 
     @staticmethod
     def eq(a, b) -> bool:
-        if a.type != b.type:
-            return False
-        avalue = a.value
-        atype = type(avalue)
-        bvalue = b.value
-        btype = type(bvalue)
-        if avalue is None:
-            return bvalue is None
-        elif atype is bool:
-            return bool(bvalue) == avalue
+        atype = type(a)
+        btype = type(b)
+        if atype is int or atype is float:
+            return (btype is int or btype is float) and a == b
         elif atype is str:
-            return str(bvalue) == avalue
-        elif atype is int or atype is float:
-            if btype is int or btype is float:
-                return avalue == bvalue
-            else:
-                return False
+            # short strings are interned, equal ones are mostly the same object
+            if btype is str:
+                return a is b or a == b
+            return btype is LuaRope and a == b.flatten()
+        elif atype is LuaRope:
+            return (btype is str or btype is LuaRope) and a.flatten() == str(b)
         else:
-            return a == b
+            return a is b
 
     @staticmethod
     def lt(a, b):
-        avalue = a.value
-        atype = type(avalue)
-        bvalue = b.value
-        btype = type(bvalue)
+        atype = type(a)
+        btype = type(b)
         if atype is str:
-            return avalue < str(bvalue)
+            return a < (b if btype is str else str(b))
         elif atype is int or atype is float:
             if btype is int or btype is float:
-                return avalue < bvalue
+                return a < b
             else:
                 raise TypeError('error comparison parameter')
+        elif atype is LuaRope:
+            return LuaValue.lt(a.flatten(), b)
         else:
             raise TypeError('error comparison')
 
@@ -154,21 +285,21 @@ class LuaValue:
         """
         le: less than or equal to
         -.-!
-        :param a: LuaValue
-        :param b: LuaValue
+        :param a: unboxed value
+        :param b: unboxed value
         :return:
         """
-        avalue = a.value
-        atype = type(avalue)
-        bvalue = b.value
-        btype = type(bvalue)
+        atype = type(a)
+        btype = type(b)
         if atype is str:
-            return avalue <= str(bvalue)
+            return a <= (b if btype is str else str(b))
         elif atype is int or atype is float:
             if btype is int or btype is float:
-                return avalue <= bvalue
+                return a <= b
             else:
                 raise TypeError('error comparison parameter')
+        elif atype is LuaRope:
+            return LuaValue.le(a.flatten(), b)
         else:
             raise TypeError('error comparison')
 
@@ -177,24 +308,49 @@ class LuaValue:
 
 
 class LuaNil(LuaValue):
+    """
+    boxes are immutable, LuaNil() and LuaBoolean() hand out shared instances
+    """
+    __slots__ = ()
+
+    def __new__(cls):
+        return nil
+
     def __init__(self):
-        super().__init__(LUATYPE.LUA_TNIL.value, None)
+        pass
 
 
 class LuaBoolean(LuaValue):
+    __slots__ = ()
+
+    def __new__(cls, value: bool):
+        return true if value else false
+
     def __init__(self, value: bool):
-        super().__init__(LUATYPE.LUA_TBOOLEAN.value, value)
+        pass
 
 
 class LuaNumber(LuaValue):
+    __slots__ = ()
+    # integers boxed by LuaNumber(i) share one preallocated box
+    SMALLINT_MIN = -128
+    SMALLINT_MAX = 1024
+
+    def __new__(cls, value: int or float):
+        if type(value) is int and LuaNumber.SMALLINT_MIN <= value < LuaNumber.SMALLINT_MAX:
+            return smallInts[value - LuaNumber.SMALLINT_MIN]
+        return newBox(cls, LUATYPE.LUA_TNUMBER.value, value)
+
     def __init__(self, value: int or float):
-        super().__init__(LUATYPE.LUA_TNUMBER.value, value)
+        pass
 
     def __repr__(self):
         return self.value
 
 
 class LuaString(LuaValue):
+    __slots__ = ()
+
     def __init__(self, value: str):
         super().__init__(LUATYPE.LUA_TSTRING.value, value)
 
@@ -202,8 +358,70 @@ class LuaString(LuaValue):
         return self.value
 
 
-class LuaClosure(LuaValue):
+def newBox(cls, luaType: int, value):
+    box = object.__new__(cls)
+    LuaValue.__init__(box, luaType, value)
+    return box
+
+
+nil = newBox(LuaNil, LUATYPE.LUA_TNIL.value, None)
+true = newBox(LuaBoolean, LUATYPE.LUA_TBOOLEAN.value, True)
+false = newBox(LuaBoolean, LUATYPE.LUA_TBOOLEAN.value, False)
+smallInts = [newBox(LuaNumber, LUATYPE.LUA_TNUMBER.value, i)
+             for i in range(LuaNumber.SMALLINT_MIN, LuaNumber.SMALLINT_MAX)]
+
+
+def unbox(value):
+    """
+    accept both boxed and unboxed values at the LuaState API boundary
+    """
+    return value.value if isinstance(value, LuaValue) else value
+
+
+class LuaClosure:
+    __slots__ = ('type', 'value', 'pyFunc', 'upvalues')
+
     def __init__(self, proto: Proto, pyFunc=None):
-        super().__init__(LUATYPE.LUA_TFUNCTION.value, proto if proto is not None else pyFunc)
+        self.type = LUATYPE.LUA_TFUNCTION.value
+        self.value = proto if proto is not None else pyFunc
         self.pyFunc = pyFunc
-        self.upvalues = [LuaNil()] * len(proto.upvalues) if proto is not None else []
+        self.upvalues = [None] * len(proto.upvalues) if proto is not None else []
+
+
+class LuaRope:
+    """
+    string made by concatenation that is not joined yet, so `s = s .. piece` in a
+    loop links a node per step instead of copying s every time; it is flattened
+    into a str the first time it is hashed, compared or handed to python
+    """
+    __slots__ = ('type', 'pieces', 'length', 'flat')
+
+    def __init__(self, pieces: tuple, length: int):
+        """
+        :param pieces: str and LuaRope parts, in order
+        :param length: total length
+        """
+        self.type = LUATYPE.LUA_TSTRING.value
+        self.pieces = pieces
+        self.length = length
+        self.flat = None
+
+    def flatten(self) -> str:
+        if self.flat is None:
+            # iterative walk, a rope built in a loop is as deep as the loop ran
+            parts = []
+            todo = [self]
+            while todo:
+                piece = todo.pop()
+                if type(piece) is str:
+                    parts.append(piece)
+                elif piece.flat is not None:
+                    parts.append(piece.flat)
+                else:
+                    todo.extend(reversed(piece.pieces))
+            self.flat = ''.join(parts)
+            self.pieces = None
+        return self.flat
+
+    def __str__(self):
+        return self.flatten()
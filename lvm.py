@@ -2,25 +2,14 @@ from lvalue import LuaClosure
 
 
 class LuaVM:
-    # def PC(self) -> int:
-    #     return self.stack.pc
-
-    def AddPC(self, n):
-        self.stack.pc += n
-
-    def Fetch(self) -> int:
-        op = self.stack.closure.value.code[self.stack.pc]
-        self.stack.pc += 1
-        return op
-
     def GetConst(self, index):
         cons = self.stack.closure.value.constants[index]
         self.stack.push(cons)
 
-    # put const value or stack value
+    # put const value or stack value, constants are decoded as -1 - index
     def GetRk(self, rk):
-        if rk > 0xFF:
-            self.GetConst(rk & 0xFF)
+        if rk < 0:
+            self.GetConst(-1 - rk)
         else:
             self.PushValue(rk + 1)
 
@@ -45,7 +34,7 @@ class LuaVM:
                 if self.stack.openuvs.get(upvalueItem[1],None) is not None:
                     closure.upvalues[i] = self.stack.openuvs.get(upvalueItem[1],None)
                 else:
-                    closure.upvalues[i] = self.stack.slots[upvalueItem[1]]
+                    closure.upvalues[i] = self.stack.slots[self.stack.base + upvalueItem[1]]
                     self.stack.openuvs[upvalueItem[1]] = closure.upvalues[i]
             else:
                 closure.upvalues[i] = self.stack.closure.upvalues[upvalueItem[1]]
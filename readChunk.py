@@ -1,10 +1,14 @@
-from struct import unpack
+import mmap
+from array import array
+from struct import Struct
 from sys import argv
 
 from lapi import LuaState
-from lvalue import LuaBoolean, LuaNil, LuaNumber, LuaString, Proto
+from lop import cacheFields, decodeCode
+from lvalue import Proto
 
-LUA_LONG_STR_LENGTH = 254
+# size byte of a string whose size_t length follows
+LUA_LONG_STR_LENGTH = 0xFF
 LUA_NIL = 0
 LUA_BOOLEAN = 1
 LUA_NUMBER = 3
@@ -12,73 +16,152 @@ LUA_INTEGER = 19
 LUA_SHORT_STR = 4
 LUA_LONG_STR = 20
 
+# fixed size fields of a chunk, native byte order and standard sizes as luac writes them
+HEADER = Struct('=4scc6scccccqd')
+CINT = Struct('=I')
+SIZET = Struct('=Q')
+INTEGER = Struct('=q')
+NUMBER = Struct('=d')
+# linedefined and lastlinedefined of a function, startpc and endpc of a local
+CINT_PAIR = Struct('=2I')
+
+
+def keepString(value: str) -> str:
+    return value
+
 
 class HandleFile:
-    def __init__(self, f):
-        self.f = f
+    def __init__(self, chunk, intern=keepString):
+        """
+        fields are decoded in place at an offset into the chunk, runs of instructions
+        and line numbers are copied out in one slice each
+        :param chunk: binary chunk: bytes, bytearray, memoryview or a binary file, a file
+        with a descriptor is mapped with mmap rather than read
+        :param intern: maps short string constants to the state's shared copy, see LuaState.internString
+        """
         self.sourcename = ''
+        self.intern = intern
+        self.pos = 0
+        self.mapping = None
+        if not isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = self.mapFile(chunk)
+        self.view = memoryview(chunk).cast('B')
+
+    def mapFile(self, f):
+        """
+        :return: the file from its current position on as a buffer
+        """
+        try:
+            fileno = f.fileno()
+        except (AttributeError, OSError):
+            fileno = None
+        if fileno is not None:
+            try:
+                self.mapping = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # empty files and pipes cannot be mapped
+                self.mapping = None
+            else:
+                self.pos = f.tell()
+                return self.mapping
+        if hasattr(f, 'getbuffer'):
+            # BytesIO hands out its buffer without a copy
+            self.pos = f.tell()
+            return f.getbuffer()
+        return f.read()
+
+    def close(self):
+        """
+        release the chunk, a mapped file is unmapped
+        """
+        self.view.release()
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def readByte(self):
-        return unpack('=B', self.f.read(1))[0]
+        value = self.view[self.pos]
+        self.pos += 1
+        return value
 
     def readString(self):
-        length = self.readByte()
+        view = self.view
+        start = self.pos + 1
+        length = view[self.pos]
         if length == LUA_NIL:
+            self.pos = start
             return ''
         elif length == LUA_LONG_STR_LENGTH:
-            length = unpack('=d', self.f.read(8))
-        return "".join(bytes.decode(i) for i in unpack('=%dc' % (length - 1), self.f.read((length - 1))))
+            length = SIZET.unpack_from(view, start)[0]
+            start += SIZET.size
+        self.pos = start + length - 1
+        return str(view[start:self.pos], 'utf-8', 'surrogateescape')
 
     def readCint(self):
-        return unpack('=I', self.f.read(4))[0]
+        value = CINT.unpack_from(self.view, self.pos)[0]
+        self.pos += CINT.size
+        return value
 
     def readInt(self):
-        return unpack('=Q', self.f.read(8))[0]
+        value = INTEGER.unpack_from(self.view, self.pos)[0]
+        self.pos += INTEGER.size
+        return value
 
     def readBoolean(self):
-        return unpack('=?', self.f.read(1))[0]
+        return self.readByte() != 0
 
     def readNumber(self):
-        return unpack('=d', self.f.read(8))[0]
+        value = NUMBER.unpack_from(self.view, self.pos)[0]
+        self.pos += NUMBER.size
+        return value
+
+    def readCints(self):
+        """
+        a size followed by that many cints, as one array
+        """
+        size = self.readCint()
+        values = array('I')
+        values.frombytes(self.view[self.pos:self.pos + size * CINT.size])
+        self.pos += size * CINT.size
+        return values
 
     def readUpvalues(self):
-        upvalues = []
         size = self.readCint()
-        for i in range(size):
-            upvalues.append(unpack('=2B', self.f.read(2)))
-        return upvalues
+        pairs = self.view[self.pos:self.pos + size * 2].tobytes()
+        self.pos += size * 2
+        # (instack, idx)
+        return list(zip(pairs[0::2], pairs[1::2]))
 
     def readLineInfo(self):
-        lineInfo = []
-        size = self.readCint()
-        for i in range(size):
-            lineInfo.append(self.readCint())
-        return lineInfo
+        return self.readCints()
 
     def readlocVars(self):
         locaVars = []
         size = self.readCint()
         for i in range(size):
-            locaVar = {}
-            locaVar['varName'] = self.readString()
-            locaVar['startPc'] = self.readCint()
-            locaVar['endPc'] = self.readCint()
-            locaVars.append(locaVar)
+            varName = self.readString()
+            startPc, endPc = CINT_PAIR.unpack_from(self.view, self.pos)
+            self.pos += CINT_PAIR.size
+            locaVars.append({'varName': varName, 'startPc': startPc, 'endPc': endPc})
         return locaVars
 
     def readUpValueNames(self):
-        upValueNames = []
         size = self.readCint()
-        for i in range(size):
-            upValueNames.append(self.readString())
-        return upValueNames
+        return [self.readString() for i in range(size)]
 
     def readProtos(self, prototype):
         # proto first byte
         self.readByte()
-        source = self.sourcename = self.readString() if prototype is 0 else self.sourcename
+        source = self.sourcename = self.readString() if prototype == 0 else self.sourcename
 
-        line_def, last_line_def = unpack('=2I', self.f.read(8))
+        line_def, last_line_def = CINT_PAIR.unpack_from(self.view, self.pos)
+        self.pos += CINT_PAIR.size
 
         numParms = self.readByte()
 
@@ -86,8 +169,7 @@ class HandleFile:
 
         maxStackSize = self.readByte()
 
-        codenum = self.readCint()
-        code = unpack('=%dI' % codenum, self.f.read(codenum * 4))
+        code = self.readCints()
 
         constantsnum = self.readCint()
 
@@ -95,15 +177,17 @@ class HandleFile:
         for i in range(constantsnum):
             type = self.readByte()
             if type == LUA_NIL:
-                constants.append(LuaNil())
+                constants.append(None)
             elif type == LUA_BOOLEAN:
-                constants.append(LuaBoolean(self.readBoolean()))
+                constants.append(self.readBoolean())
             elif type == LUA_NUMBER:
-                constants.append(LuaNumber(self.readNumber()))
+                constants.append(self.readNumber())
             elif type == LUA_INTEGER:
-                constants.append(LuaNumber(self.readInt()))
-            elif type == LUA_SHORT_STR or type == LUA_LONG_STR:
-                constants.append(LuaString(self.readString()))
+                constants.append(self.readInt())
+            elif type == LUA_SHORT_STR:
+                constants.append(self.intern(self.readString()))
+            elif type == LUA_LONG_STR:
+                constants.append(self.readString())
             else:
                 raise TypeError('type not support')
 
@@ -111,12 +195,7 @@ class HandleFile:
 
         protosize = self.readCint()
 
-        nestproto = None
-        protos = []
-        if protosize > 0:
-            for i in range(protosize):
-                nestproto = self.readProtos(1)
-                protos.append(nestproto)
+        protos = [self.readProtos(1) for i in range(protosize)]
         lineinfo = self.readLineInfo()
         locVars = self.readlocVars()
 
@@ -124,14 +203,16 @@ class HandleFile:
         proto = Proto(source, line_def, last_line_def, numParms, isVararg, maxStackSize, code, constants, upValues,
                       protos,
                       lineinfo, locVars, upvalueNames)
+        proto.insts = cacheFields(decodeCode(code), constants, upvalueNames)
         return proto
 
     def readHead(self):
         """
         read luac out file header
         """
-        sig, version, form, luac_Data, cintSize, sizetSize, instructSize, luaIntSize, luaNumSize, luac_Int, luac_Float = unpack(
-            '=4scc6scccccqd', self.f.read(33))
+        sig, version, form, luac_Data, cintSize, sizetSize, instructSize, luaIntSize, luaNumSize, luac_Int, luac_Float = \
+            HEADER.unpack_from(self.view, self.pos)
+        self.pos += HEADER.size
 
 
 if __name__ == '__main__':
@@ -6,7 +6,7 @@ from lvalue import LuaString
 
 class TestHelper:
     @classmethod
-    def setUpFuncForVm(cls, luaOutFilePath):
+    def setUpFuncForVm(cls, luaOutFilePath, **options):
         cls.result = []
 
         def printLua(ls):
@@ -27,7 +27,7 @@ class TestHelper:
         parent_path = os.path.split(os.path.split(current_path)[0])[0]
         luacpath = os.path.join(parent_path, 'lua', luaOutFilePath)
         f = open(luacpath, 'rb')
-        ls = LuaState()
+        ls = LuaState(**options)
         ls.Register(LuaString('print'), printLua)
         ls.Load(f, luaOutFilePath, 'b')
         ls.Call(0, 0)
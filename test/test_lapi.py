@@ -1,6 +1,7 @@
 import unittest
 from lapi import LuaState, ARIOPENUM, COMOPENUM, LuaArray
-from ltable import LuaDict
+from ltable import TM_INDEX, TM_NEWINDEX, LuaDict, LuaTable, Shape, emptyShape, metamethod
+from lvalue import LuaBoolean, LuaNil, LuaNumber, LuaRope
 from test.testHelper import TestHelper
 
 
@@ -88,6 +89,13 @@ class TestLuaStateStackApi(unittest.TestCase, TestHelper):
         self.assertEqual(self.getStackInfo()[-1], 3)
         self.removeAllItems()
 
+    def test_arith_modZero(self):
+        self.lvm.PushInteger(1)
+        self.lvm.PushInteger(0)
+        with self.assertRaisesRegex(ZeroDivisionError, "^attempt to perform 'n%0'$"):
+            self.lvm.Arith(ARIOPENUM.LUA_OPMOD.value)
+        self.removeAllItems()
+
     def test_arith_band(self):
         self.lvm.PushInteger(60)
         self.lvm.PushInteger(13)
@@ -125,6 +133,28 @@ class TestLuaStateStackApi(unittest.TestCase, TestHelper):
         self.assertEqual(self.getStackInfo()[-1], 'hello world')
         self.removeAllItems()
 
+    def test_concatInterned(self):
+        self.lvm.PushString('hello world')
+        self.lvm.PushString('hello ')
+        self.lvm.PushString('world')
+        self.lvm.Concat(2)
+        self.assertIs(self.lvm.stack.get(-1), self.lvm.stack.get(-2))
+        self.removeAllItems()
+
+    def test_concatNotInterned(self):
+        self.lvm.PushString('k')
+        self.lvm.Pop(1)
+        size = len(self.lvm.strt)
+        for i in range(1000):
+            self.lvm.PushString('k')
+            self.lvm.PushInteger(i)
+            self.lvm.Concat(2)
+            self.lvm.ToString(-1)
+            self.lvm.PushNumber(i + 0.5)
+            self.lvm.ToString(-1)
+            self.lvm.Pop(2)
+        self.assertEqual(len(self.lvm.strt), size)
+
     def test_len(self):
         self.lvm.PushString('hello ')
         self.lvm.PushString('world')
@@ -135,12 +165,234 @@ class TestLuaStateStackApi(unittest.TestCase, TestHelper):
     def test_luaArray(self):
         self.arr = LuaArray()
         with self.assertRaises(TypeError):
-            self.arr.append(11)
+            self.arr.append(object())
 
     def test_luaDict(self):
         self.map = LuaDict()
         with self.assertRaises(TypeError):
-            self.map['errorkey'] = 'errorvalue'
+            self.map['errorkey'] = object()
+
+    def test_tableRehash(self):
+        t = LuaTable(0, 0)
+        for i in range(10, 0, -1):
+            t.put(i, i)
+        t.put('x', 1)
+        self.assertEqual(t.asize, 16)
+        self.assertEqual(t.hashKeys(), ['x'])
+        self.assertEqual(t.len(), 10)
+        self.assertEqual([t.get(i) for i in range(1, 11)], list(range(1, 11)))
+
+    def test_tablePresized(self):
+        t = LuaTable(4, 2)
+        self.assertEqual(t.asize, 4)
+        t.put(3, 'c')
+        self.assertIn(t.len(), (0, 3))
+        t.put(1, 'a')
+        t.put(2, 'b')
+        self.assertEqual(t.len(), 3)
+
+    def test_tableTypedArray(self):
+        t = LuaTable(3, 0)
+        for i in range(1, 4):
+            t.put(i, i * 0.5)
+        self.assertEqual(t.arr.typecode, 'd')
+        t.put(4, 2.0)
+        self.assertEqual(t.arr.typecode, 'd')
+        t.put(2, 7)
+        self.assertIs(type(t.arr), list)
+        self.assertEqual([t.get(i) for i in range(1, 5)], [0.5, 7, 1.5, 2.0])
+        self.assertIs(type(t.get(2)), int)
+
+    def test_tableKeys(self):
+        t = LuaTable(0, 0)
+        key = 1.5
+        t.put(key, 'half')
+        t.put(2.0, 'two')
+        t.put(True, 'true')
+        self.assertEqual(t.get(float('1.5')), 'half')
+        self.assertEqual(t.get(2), 'two')
+        self.assertIs(type(key), float)
+        self.assertEqual(t.get(True), 'true')
+        self.assertIsNone(t.get(1))
+        with self.assertRaises(TypeError):
+            t.put(float('nan'), 1)
+        with self.assertRaises(TypeError):
+            t.put(None, 1)
+
+    def test_tableBorder(self):
+        t = LuaTable(4, 4)
+        for i in range(1, 8):
+            t.put(i, i)
+        self.assertEqual(t.asize, 4)
+        self.assertEqual(t.len(), 7)
+        t.put(6, None)
+        self.assertIn(t.len(), (5, 7))
+
+    def test_tableQueue(self):
+        t = LuaTable(0, 0)
+        for i in range(1, 1001):
+            t.put(i, i)
+        first = 1
+        for i in range(1001, 3001):
+            t.put(t.len() + 1, i)
+            t.put(first, None)
+            first += 1
+            t.put(t.len(), None)
+        n = t.len()
+        self.assertTrue(n == 0 or t.get(n) is not None)
+        self.assertIsNone(t.get(n + 1))
+        self.assertIsNone(t.get(first - 1))
+
+    def test_tablePutList(self):
+        t = LuaTable(0, 0)
+        t.put(5, 'five')
+        t.putList(1, [1, 2, 3])
+        self.assertEqual(t.arr.typecode, 'q')
+        t.putList(4, [4, 5])
+        self.assertEqual(t.asize, 5)
+        self.assertEqual(t.hashKeys(), [])
+        self.assertEqual([t.get(i) for i in range(1, 6)], [1, 2, 3, 4, 5])
+        t.putList(7, [None, 'x', None])
+        self.assertIs(type(t.arr), list)
+        self.assertEqual([t.get(i) for i in range(5, 10)], [5, None, None, 'x', None])
+        self.assertIn(t.len(), (5, 8))
+
+    def test_tableShape(self):
+        a = LuaTable(0, 0)
+        b = LuaTable(0, 0)
+        for t in (a, b):
+            t.put('x', 1)
+            t.put('y', 2)
+        self.assertIs(a.shape, b.shape)
+        self.assertEqual(a.shape.keys, ('x', 'y'))
+        b.put('y', 3)
+        self.assertEqual((a.get('y'), b.get('y')), (2, 3))
+        b.put(1.5, 'f')
+        self.assertIs(a.shape, b.shape)
+        b.put('x', None)
+        self.assertIsNone(b.shape)
+        self.assertEqual((b.get('x'), b.get('y'), b.get(1.5)), (None, 3, 'f'))
+
+    def test_tableShapeAfterDictLike(self):
+        # tables used as dicts of many distinct keys leave the shape tree once they are gone
+        for i in range(4 * Shape.MAXTRANSITIONS):
+            t = LuaTable(0, 0)
+            t.put('gone{}'.format(i), i)
+        # or once they moved their keys to a dict
+        kept = []
+        for i in range(2 * Shape.MAXTRANSITIONS):
+            t = LuaTable(0, 0)
+            for j in range(Shape.MAXKEYS + 1):
+                t.put('kept{}.{}'.format(i, j), j)
+            self.assertIsNone(t.shape)
+            kept.append(t)
+        a = LuaTable(0, 0)
+        b = LuaTable(0, 0)
+        for t in (a, b):
+            t.put('late', 1)
+            t.put('record', 2)
+        self.assertIsNotNone(a.shape)
+        self.assertIs(a.shape, b.shape)
+        self.assertLessEqual(len(emptyShape.transitions), Shape.MAXTRANSITIONS)
+
+    def test_tableShapeRopeKey(self):
+        t = LuaTable(0, 0)
+        t.put('x', 1)
+        self.assertIsNotNone(t.shape)
+        self.assertEqual(t.get(LuaRope(('', 'x'), 1)), 1)
+        t.put(LuaRope(('y', ''), 1), 2)
+        self.assertIsNotNone(t.shape)
+        self.assertEqual(t.get('y'), 2)
+        self.assertEqual(t.get(LuaRope(('y',), 1)), 2)
+
+    def test_tableNext(self):
+        t = LuaTable(0, 0)
+        t.put(1, 'a')
+        t.put(2, 'b')
+        t.put(True, 'c')
+        t.put('x', 'd')
+        self.assertEqual(t.next(None), (1, 'a'))
+        self.assertEqual(t.next(2), ('x', 'd'))
+        t.put('x', None)
+        self.assertEqual(t.next('x'), (True, 'c'))
+        self.assertEqual(t.next(True), (None, None))
+        with self.assertRaises(KeyError):
+            t.next('y')
+
+    def test_next(self):
+        self.lvm.NewTable()
+        self.lvm.PushString('v')
+        self.lvm.SetField(-2, 'k')
+        self.lvm.PushNil()
+        self.assertTrue(self.lvm.Next(-2))
+        self.assertEqual(self.lvm.ToPyString(-2), 'k')
+        self.assertEqual(self.lvm.ToPyString(-1), 'v')
+        self.lvm.Pop(1)
+        self.assertFalse(self.lvm.Next(-2))
+        self.lvm.Pop(1)
+
+    def test_metamethodFlags(self):
+        mt = LuaTable(0, 0)
+        t = LuaTable(0, 0)
+        self.assertIsNone(metamethod(mt, TM_INDEX))
+        self.assertTrue(mt.flags & (1 << TM_INDEX))
+        mt.put('__newindex', mt)
+        self.assertEqual(mt.flags, 0)
+        self.assertIs(metamethod(mt, TM_NEWINDEX), mt)
+        self.assertFalse(mt.flags & (1 << TM_NEWINDEX))
+        self.assertIsNone(metamethod(mt, TM_INDEX))
+        # replacing a handler keeps the bits of the others
+        mt.put('__newindex', t)
+        self.assertTrue(mt.flags & (1 << TM_INDEX))
+        self.assertIsNone(metamethod(None, TM_INDEX))
+
+    def test_index(self):
+        t = LuaTable(0, 0)
+        mt = LuaTable(0, 0)
+        t.metatable = mt
+        self.assertIsNone(self.lvm.getTable(t, 'k'))
+        fallback = LuaTable(0, 0)
+        fallback.put('k', 'v')
+        mt.put('__index', fallback)
+        self.assertEqual(self.lvm.getTable(t, 'k'), 'v')
+        self.lvm.setTable(t, 'n', 1)
+        self.assertEqual(t.get('n'), 1)
+        mt.put('__newindex', fallback)
+        self.lvm.setTable(t, 'm', 2)
+        self.assertIsNone(t.get('m'))
+        self.assertEqual(fallback.get('m'), 2)
+        self.lvm.setTable(t, 'n', 3)
+        self.assertEqual(t.get('n'), 3)
+
+    def test_indexLoop(self):
+        t = LuaTable(0, 0)
+        mt = LuaTable(0, 0)
+        mt.put('__index', t)
+        mt.put('__newindex', t)
+        t.metatable = mt
+        with self.assertRaises(RuntimeError):
+            self.lvm.getTable(t, 'k')
+        with self.assertRaises(RuntimeError):
+            self.lvm.setTable(t, 'k', 1)
+
+    def test_metatable(self):
+        self.lvm.NewTable()
+        self.assertFalse(self.lvm.GetMetatable(-1))
+        self.lvm.NewTable()
+        self.lvm.SetMetatable(-2)
+        self.assertTrue(self.lvm.GetMetatable(-1))
+        self.lvm.Pop(1)
+        self.lvm.PushNil()
+        self.lvm.SetMetatable(-2)
+        self.assertFalse(self.lvm.GetMetatable(-1))
+        self.lvm.Pop(1)
+
+    def test_sharedBoxes(self):
+        self.assertIs(LuaNil(), LuaNil())
+        self.assertIs(LuaBoolean(1 == 1), LuaBoolean(True))
+        self.assertIs(LuaNumber(7), LuaNumber(7))
+        self.assertEqual(LuaNumber(7).value, 7)
+        self.assertIsNot(LuaNumber(7.0), LuaNumber(7.0))
 
 
 if __name__ == '__main__':
@@ -1,4 +1,13 @@
+import io
+import os
 import unittest
+from unittest import mock
+
+from lapi import LuaState
+from ljit import compileProto
+from lop import CACHEDOPCODE, FUSEDOPCODE, OPCODE, QUICKENEDOPCODE, Instruction, cacheFields, decodeCode, dispatch, \
+    fuseCode, opcodes
+from lvalue import LuaString, Proto
 from test.testHelper import TestHelper
 
 
@@ -30,5 +39,300 @@ class TestLuaVMUpValueApi(unittest.TestCase, TestHelper):
     def test_upvalueresult(self):
         self.assertEqual(self.getValueInStack(-1), 2.0)
 
+
+class TestLuaVMArithApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('arith.out')
+
+    def test_arithresult(self):
+        self.assertEqual(self.result, [36, 9, 5, 14, 3.5, 3, 1, 49, -7, 3, 4, True, False, True, True])
+
+
+class TestLuaVMFloorDivApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('floordiv.out')
+
+    def test_floordivresult(self):
+        inf = float('inf')
+        self.assertEqual(self.result, [3, -4, 3.0, 2, -2, -0.5, 1024.0, inf, -inf, inf, 11.0, 3])
+
+
+class TestLuaVMForLoopApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('forloop.out')
+
+    def test_forloopresult(self):
+        self.assertEqual(self.result, [22, 5.0, 6, '3', '2.0'])
+
+
+class TestLuaVMJitForLoopApi(TestLuaVMForLoopApi):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('forloop.out', jit=True)
+
+
+class TestLuaVMJitApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('arith.out', jit=True)
+
+    def test_arithresult(self):
+        self.assertEqual(self.result, [36, 9, 5, 14, 3.5, 3, 1, 49, -7, 3, 4, True, False, True, True])
+
+    def test_fallback(self):
+        code = [OPCODE.OP_TFORCALL.value, OPCODE.OP_RETURN.value | 1 << 23]
+        proto = Proto('', 0, 0, 0, False, 2, code, [], [], [], [0, 0], [], [])
+        with mock.patch('ljit.DELEGATED', frozenset([OPCODE.OP_RETURN.value])):
+            compileProto(proto)
+        self.assertIs(proto.compiled, False)
+
+
+class TestLuaVMJitUpValueApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('closure.out', jit=True)
+
+    def test_upvalueresult(self):
+        self.assertEqual(self.result, [1, 2, 1, 3, 2])
+
+
+class TestDecodeCode(unittest.TestCase):
+    @staticmethod
+    def abc(op, a, b, c):
+        return op | a << 6 | c << 14 | b << 23
+
+    def test_rkOperands(self):
+        code = [self.abc(OPCODE.OP_ADD.value, 0, 1, 0x100 | 2)]
+        self.assertEqual(decodeCode(code), [(OPCODE.OP_ADD.value, 0, 1, -3)])
+
+    def test_extraArgMerged(self):
+        code = [OPCODE.OP_LOADKX.value | 3 << 6, OPCODE.OP_EXTRAARG.value | 300 << 6]
+        self.assertEqual(decodeCode(code)[0], (OPCODE.OP_LOADKX.value, 3, 300, 0))
+
+    def test_setListExtraArg(self):
+        # a block number past MAXARG_C is carried by EXTRAARG as is
+        code = [self.abc(OPCODE.OP_SETLIST.value, 0, 2, 0), OPCODE.OP_EXTRAARG.value | 600 << 6]
+        inst = decodeCode(code)[0]
+        self.assertEqual(inst, (OPCODE.OP_SETLIST.value, 0, 2, 600))
+        ls = LuaState()
+        ls.NewTable()
+        ls.PushInteger(7)
+        ls.PushInteger(8)
+        dispatch[inst[0]](ls, inst, 2)
+        t = ls.stack.slots[ls.stack.base]
+        self.assertEqual((t.get(599 * 50 + 1), t.get(599 * 50 + 2), t.get(600 * 50 + 1)), (7, 8, None))
+
+    def test_matchesInstruction(self):
+        code = [OPCODE.OP_LOADK.value | 2 << 6 | 7 << 14, OPCODE.OP_JMP.value | (0x1FFFF - 3) << 14,
+                self.abc(OPCODE.OP_GETTABUP.value, 1, 0, 0x100 | 4), OPCODE.OP_EXTRAARG.value | 1000 << 6]
+        self.assertEqual(decodeCode(code), [tuple(Instruction(i).decode()) for i in code])
+
+    def test_dispatchCoversOpcodes(self):
+        self.assertEqual(len(dispatch), len(opcodes) + len(FUSEDOPCODE) + len(CACHEDOPCODE) + len(QUICKENEDOPCODE))
+
+    def test_fuseCompareJump(self):
+        code = [self.abc(OPCODE.OP_EQ.value, 0, 5, 0x100 | 5), OPCODE.OP_JMP.value | (1 + 0x1FFFF) << 14,
+                self.abc(OPCODE.OP_ADD.value, 0, 0, 4)]
+        insts = fuseCode(decodeCode(code))
+        self.assertEqual(insts[0], (FUSEDOPCODE.OP_EQJMP.value, 0, 5, -6, 3, 0))
+        self.assertEqual(insts[1][0], OPCODE.OP_JMP.value)
+
+    def test_cacheFields(self):
+        code = [self.abc(OPCODE.OP_GETTABLE.value, 1, 0, 0x100 | 0), self.abc(OPCODE.OP_GETTABLE.value, 1, 0, 0x100 | 1),
+                self.abc(OPCODE.OP_SETTABLE.value, 0, 0x100 | 0, 1)]
+        constants = ['x', 1]
+        insts = cacheFields(decodeCode(code), constants, [])
+        self.assertEqual(insts[0][:4], (CACHEDOPCODE.OP_GETFIELD.value, 1, 0, constants[0]))
+        self.assertEqual(insts[1], (OPCODE.OP_GETTABLE.value, 1, 0, -2))
+        self.assertEqual(insts[2][:4], (CACHEDOPCODE.OP_SETFIELD.value, 0, constants[0], 1))
+
+
+class TestLuaVMFieldCacheApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('oop.out')
+
+    def test_fieldresult(self):
+        self.assertEqual(self.result, [90, 3])
+
+
+class TestLuaVMGlobalApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('globals.out')
+
+    def test_globalresult(self):
+        self.assertEqual(self.result, [15, 102, 33, 93])
+
+
+class TestLuaVMQuickenApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('quicken.out')
+
+    def test_quickenresult(self):
+        self.assertEqual(self.result, [3, 3.75, 5, True, True, False, 12, 30])
+
+    def test_quickenedSites(self):
+        ls = LuaState()
+        with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lua', 'quicken.out'),
+                  'rb') as f:
+            ls.Load(f, 'quicken.out', 'b')
+        proto = ls.stack.get(-1).value
+        ls.Register(LuaString('print'), lambda state: 0)
+        ls.Call(0, 0)
+        addProto, lessProto, mulProto = proto.protos
+        # int-int first, then float-float deoptimizes the site for good
+        self.assertEqual(addProto.insts[0][0], QUICKENEDOPCODE.OP_ADD_GENERIC.value)
+        # number compare first, then the string compare deoptimizes it
+        self.assertEqual(lessProto.insts[0][0], QUICKENEDOPCODE.OP_LT_GENERIC.value)
+        self.assertEqual(mulProto.insts[0][0], QUICKENEDOPCODE.OP_MUL_II.value)
+
+
+class TestLuaVMCallApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('calls.out')
+
+    def test_callresult(self):
+        self.assertEqual(self.result, [610, 6, 3, 4, 5050, 1, 2, 3])
+
+
+class TestLuaVMJitCallApi(TestLuaVMCallApi):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('calls.out', jit=True)
+
+
+class TestLuaVMConcatApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('concat.out')
+
+    def test_concatresult(self):
+        self.assertEqual(self.result, ['row:3|0.3|9.007199254741e+15|1.5|-0.0|1e+100', '1,2,3,4,5,6,7,8,9,10,', 24])
+
+
+class TestLuaVMRopeApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('rope.out')
+
+    def test_roperesult(self):
+        self.assertEqual(self.result, [51, 1, True, False, True, 'ab' * 25 + '!1'])
+
+
+class TestLuaVMSetListApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('setlist.out')
+
+    def test_setlistresult(self):
+        self.assertEqual(self.result, [65, 1830, 0.5, 's', 9, 3, 'nil', 4, 9, 4])
+
+
+class TestLuaVMShapeApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('shape.out')
+
+    def test_shaperesult(self):
+        self.assertEqual(self.result, [29, 3, 6, 7, 'nil', 8, 3])
+
+
+class TestLuaVMJitShapeApi(TestLuaVMShapeApi):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('shape.out', jit=True)
+
+
+class TestLuaVMIterApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('iter.out')
+
+    def test_iterresult(self):
+        self.assertEqual(self.result, [8, 13.5, 120, 60, 3, 1, 10, 'nil', 'nil', 5050.0, 15, 6])
+
+
+class TestLuaVMJitIterApi(TestLuaVMIterApi):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('iter.out', jit=True)
+
+
+class TestLuaVMMetaApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('meta.out')
+
+    def test_metaresult(self):
+        self.assertEqual(self.result, [4, 6, 3, 2, -1, 11, True, True, True, False, 25, 10, 'v!1', '<v',
+                                       6, 'b?', 'nil', 1, 2, False, 0, 'nil', 3, 'late', 'undefinedGlobal!', 73,
+                                       'locked', 'nil'])
+
+
+class TestLuaVMJitMetaApi(TestLuaVMMetaApi):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('meta.out', jit=True)
+
+
+class TestLuaVMStringsApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('strings.out')
+
+    def test_stringsresult(self):
+        # 253 characters still fit the size byte, 300 need a size_t length
+        self.assertEqual(self.result, [253, 300, 553, True])
+
+
+class TestLoadChunk(unittest.TestCase):
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lua', 'strings.out')
+
+    def runChunk(self, chunk):
+        result = []
+
+        def printLua(ls):
+            result.extend(ls.ToInteger(i) for i in range(1, 4))
+            return 0
+
+        ls = LuaState()
+        ls.Register(LuaString('print'), printLua)
+        ls.Load(chunk, 'strings.out', 'b')
+        ls.Call(0, 0)
+        return result
+
+    def test_sources(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for chunk in (data, bytearray(data), memoryview(data), io.BytesIO(data)):
+            self.assertEqual(self.runChunk(chunk), [253, 300, 553])
+
+    def test_mappedFile(self):
+        with open(self.path, 'rb') as f:
+            self.assertEqual(self.runChunk(f), [253, 300, 553])
+
+    def test_bufferReleased(self):
+        with open(self.path, 'rb') as f:
+            chunk = io.BytesIO(f.read())
+        self.runChunk(chunk)
+        # the loader let go of the BytesIO buffer, so it can grow again
+        chunk.seek(0, io.SEEK_END)
+        chunk.write(b'x')
+
+
+class TestLuaVMUnfusedApi(unittest.TestCase, TestHelper):
+    @classmethod
+    def setUpClass(cls):
+        cls.setUpFuncForVm('loop.out', fuse=False)
+
+    def test_loopresult(self):
+        self.assertEqual(self.getValueInStack(-1), 2550)
+
 if __name__ == '__main__':
     unittest.main()